@@ -14,5 +14,8 @@ python manage.py collectstatic --no-input
 
 python manage.py makemigrations
 python manage.py migrate
+python manage.py rebuild_denormalized_items
+python manage.py rebuild_search_index
+python manage.py rebuild_item_documents
 
 #celery -A config worker --loglevel=info
@@ -14,6 +14,7 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
 from django.utils.translation import gettext_lazy as _
 from dotenv import load_dotenv
 
@@ -113,6 +114,25 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # A file, not memory, so threaded stock tests get a connection
+            # per thread.
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    # Per process: the store's response caches and ETags stay off with it,
+    # since writes made by Celery workers could not retire them.
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         }
     }
 
@@ -181,8 +201,20 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "store_service.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
+# Render item and order lists from values() rows (store_service.fastpath)
+# instead of per-field DRF serialization.
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION") == "TRUE"
+
+# How long a basket line holds its stock before the sweeper
+# (release_expired_holds) gives it back.
+BASKET_HOLD_MINUTES = int(os.environ.get("BASKET_HOLD_MINUTES") or 30)
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
@@ -201,10 +233,18 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
     "http://localhost:5173",
 ]
+# Anonymous baskets travel in this header (store_service.baskets).
+CORS_ALLOW_HEADERS = (*default_headers, "x-basket-token")
+CORS_EXPOSE_HEADERS = ["X-Basket-Token"]
 
 STRIPE_PUBLISHABLE_KEY = os.environ["STRIPE_PUBLISHABLE_KEY"]
 STRIPE_SECRET_KEY = os.environ["STRIPE_SECRET_KEY"]
 STRIPE_WEBHOOK_SECRET = os.environ["STRIPE_WEBHOOK_SECRET"]
+# Point at a local server (manage.py fake_stripe) to run checkouts offline.
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE") or "https://api.stripe.com"
+# Leave checkout sessions to the outbox worker (process_checkout_outbox)
+# instead of also trying once right after the order commits.
+CHECKOUT_WORKER_ONLY = os.environ.get("CHECKOUT_WORKER_ONLY") == "TRUE"
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=555),
@@ -225,8 +265,24 @@ SPECTACULAR_SETTINGS = {
 CHAT_ID = os.environ["CHAT_ID"]
 TG_TOKEN = os.environ["TG_TOKEN"]
 
+# Item documents re-rendered for stock moves, or for more than the sync
+# limit of items at once (a size or colour rename), are left to Celery
+# when a broker is set instead of being rendered in the request.
+ASYNC_DOCUMENT_REBUILDS = bool(os.environ.get("CELERY_BROKER_URL"))
+DOCUMENT_REBUILD_SYNC_LIMIT = 50
+
 # CELERY_BROKER_URL = os.environ["CELERY_BROKER_URL"]
 # CELERY_RESULT_BACKEND = os.environ["CELERY_RESULT_BACKEND"]
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-basket-holds": {
+        "task": "store_service.utils.release_expired_holds_task",
+        "schedule": 60,
+    },
+    "process-checkout-outbox": {
+        "task": "store_service.utils.process_checkout_outbox_task",
+        "schedule": 10,
+    },
+}
 
 LANGUAGES = [
     ("en", _("English")),
@@ -4,6 +4,7 @@ from modeltranslation.admin import TranslationAdmin
 from .models import (
     Basket,
     Category,
+    CheckoutOutbox,
     ImageItem,
     Item,
     ItemColor,
@@ -27,14 +28,34 @@ class ImageItemInline(admin.TabularInline):
 
 @admin.register(Item)
 class ItemAdmin(TranslationAdmin):
-    list_display = ("name", "price", "category", "sale")
-    list_filter = ("category", "sale")
+    list_display = (
+        "name",
+        "price",
+        "effective_price",
+        "category",
+        "sale",
+        "total_stock",
+        "variants",
+    )
+    list_filter = ("category", "sale", "in_stock")
     search_fields = (
         "name",
         "brand",
     )
+    readonly_fields = ("effective_price", "total_stock", "in_stock")
     inlines = [ItemDescriptionInline, ImageItemInline]  #
 
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related("category")
+            .with_variant_summary()
+        )
+
+    @admin.display(description="Variants in stock")
+    def variants(self, obj):
+        return f"{obj.available_variant_count} / {obj.variant_count}"
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -49,9 +70,17 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
 
 
+@admin.register(CheckoutOutbox)
+class CheckoutOutboxAdmin(admin.ModelAdmin):
+    list_display = ("order", "status", "attempts", "next_attempt_at")
+    list_filter = ("status",)
+    readonly_fields = ("order", "attempts", "last_error", "created_at")
+
+
 @admin.register(ItemInventory)
 class ItemInventoryAdmin(admin.ModelAdmin):
-    list_display = ("item", "size", "color", "quantity")
+    list_display = ("item", "size", "color", "quantity", "reserved")
+    readonly_fields = ("reserved",)
     list_filter = (
         "item",
         "size",
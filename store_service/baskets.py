@@ -0,0 +1,306 @@
+"""
+Bulk basket changes and anonymous baskets.
+
+``apply_basket_lines`` validates every requested line against
+ItemInventory with one query, then writes the basket and the stock holds
+with a fixed number of bulk statements, whatever the number of lines.
+Lines that cannot be applied are reported and leave the basket as it
+was for their variant.
+
+Shoppers who are not logged in keep their lines in the cache under a
+signed basket token instead, with no database writes and no stock held,
+until ``merge_anonymous_basket`` moves them into their Basket on login.
+Those lines keep the id of their inventory row, so a basket filled in one
+language merges under another.
+
+``basket_summary`` totals a basket with two aggregate queries for
+clients that only need the numbers.
+"""
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import (
+    AVAILABLE,
+    Basket,
+    BasketItem,
+    Item,
+    ItemColor,
+    ItemInventory,
+)
+from .stock import InsufficientStock, hold_expiry, release_holds
+
+NOT_FOUND = "Item, size, color, or inventory not found"
+
+BASKET_TOKEN_HEADER = "X-Basket-Token"
+ANONYMOUS_BASKET_KEY = "store:basket:anonymous:{}"
+ANONYMOUS_BASKET_TIMEOUT = 60 * 60 * 24 * 7
+ANONYMOUS_BASKET_SIGNER = signing.TimestampSigner(
+    salt="store_service.baskets.anonymous"
+)
+
+
+def variant_key(line):
+    """
+    Key of ``line`` in ``resolve_variants``: its ``inventory`` id when it
+    has one, otherwise its (item, size, color) names.
+    """
+    if line.get("inventory") is not None:
+        return line["inventory"]
+    return line["item"], line["size"], line["color"]
+
+
+def resolve_variants(lines, lock: bool = True) -> dict:
+    """
+    Inventory rows of ``lines`` keyed by ``variant_key``, locked until the
+    end of the transaction unless ``lock`` is false. Names are matched in
+    the active language; ids match whatever language the line was made in.
+    """
+    rows = ItemInventory.objects.all()
+    if lock:
+        rows = rows.select_for_update(of=("self",))
+    named = [line for line in lines if line.get("inventory") is None]
+    match = Q(id__in={
+        line["inventory"] for line in lines
+        if line.get("inventory") is not None
+    })
+    if named:
+        match |= Q(
+            item__in=Item.objects.filter(
+                name__in={line["item"] for line in named}
+            ),
+            size__size__in={line["size"] for line in named},
+            color__in=ItemColor.objects.filter(
+                color__in={line["color"] for line in named}
+            ),
+        )
+    variants = {}
+    for row in rows.select_related("item", "size", "color").filter(match):
+        variants[row.id] = row
+        variants[row.item.name, row.size.size, row.color.color] = row
+    return variants
+
+
+def apply_basket_lines(basket, lines, replace: bool = False) -> list:
+    """
+    Add ``lines`` (dicts of item, size, color names or an inventory id,
+    and quantity) to ``basket``, or with ``replace`` make them its whole
+    content, and return one result per line in order. Must run inside a
+    transaction. Repeated variants are summed.
+    """
+    variants = resolve_variants(lines)
+    current = {
+        (line.item_id, line.size_id, line.color_id): line
+        for line in BasketItem.objects.select_for_update().filter(
+            basket=basket
+        )
+    }
+
+    requested = {}
+    for line in lines:
+        inventory = variants.get(variant_key(line))
+        if inventory is not None:
+            requested[inventory] = (
+                requested.get(inventory, 0) + line["quantity"]
+            )
+
+    expires_at = hold_expiry()
+    applied, errors, failed = {}, {}, set()
+    holds, created, updated = [], [], []
+    for inventory, quantity in requested.items():
+        key = (inventory.item_id, inventory.size_id, inventory.color_id)
+        line = current.get(key)
+        held = 0
+        if line is not None and line.hold_expires_at is not None:
+            held = line.quantity
+        if line is not None and not replace:
+            quantity += line.quantity
+        if quantity - held > inventory.available:
+            errors[inventory] = str(
+                InsufficientStock(quantity, inventory.item)
+            )
+            failed.add(key)
+            continue
+
+        if quantity != held:
+            inventory.reserved = F("reserved") + (quantity - held)
+            holds.append(inventory)
+        if line is None:
+            line = BasketItem(
+                basket=basket,
+                item=inventory.item,
+                size=inventory.size,
+                color=inventory.color,
+                price=inventory.item.effective_price,
+            )
+            created.append(line)
+        else:
+            updated.append(line)
+        line.quantity = quantity
+        line.hold_expires_at = expires_at
+        applied[inventory] = line
+
+    if holds:
+        ItemInventory.objects.bulk_update(holds, ["reserved"])
+    if created:
+        BasketItem.objects.bulk_create(created)
+    if updated:
+        BasketItem.objects.bulk_update(
+            updated,
+            ["quantity", "hold_expires_at"]
+        )
+    if replace:
+        # Lines that failed keep their current quantity and hold.
+        kept = {line.id for line in applied.values()} | {
+            current[key].id for key in failed if key in current
+        }
+        removed = BasketItem.objects.filter(
+            id__in=[
+                line.id for line in current.values() if line.id not in kept
+            ]
+        )
+        release_holds(removed)
+        removed.delete()
+
+    results = []
+    for line in lines:
+        inventory = variants.get(variant_key(line))
+        if inventory in applied:
+            basket_item = applied[inventory]
+            results.append({
+                **line,
+                "item": inventory.item.name,
+                "size": inventory.size.size,
+                "color": inventory.color.color,
+                "status": "ok",
+                "id": basket_item.id,
+                "quantity": basket_item.quantity,
+                "hold_expires_at": basket_item.hold_expires_at,
+            })
+        else:
+            results.append({
+                **line,
+                "status": "error",
+                "error": errors.get(inventory, NOT_FOUND),
+            })
+    return results
+
+
+def basket_summary(user) -> dict:
+    """
+    Line count, quantity, subtotal and sale savings of ``user``'s basket
+    at current effective prices, and for every line how many units it
+    can have. One aggregate query for the totals and one for the lines,
+    whatever the basket size.
+    """
+    lines = BasketItem.objects.filter(basket__user=user).order_by()
+    money = DecimalField(max_digits=12, decimal_places=2)
+    discount = F("item__price") - F("item__effective_price")
+    totals = lines.aggregate(
+        lines=Count("id"),
+        units=Coalesce(Sum("quantity"), 0),
+        subtotal=Coalesce(
+            Sum(F("quantity") * F("item__effective_price"),
+                output_field=money),
+            Value(Decimal("0")),
+            output_field=money,
+        ),
+        savings=Coalesce(
+            Sum(F("quantity") * discount, output_field=money),
+            Value(Decimal("0")),
+            output_field=money,
+        ),
+    )
+    variant_available = ItemInventory.objects.filter(
+        item=OuterRef("item"),
+        size=OuterRef("size"),
+        color=OuterRef("color"),
+    ).values(available=AVAILABLE)[:1]
+    # A line's own hold is part of ``reserved`` but still counts for it.
+    available = lines.annotate(
+        available=Coalesce(Subquery(variant_available), 0) + Case(
+            When(hold_expires_at__isnull=False, then=F("quantity")),
+            default=0,
+        ),
+    ).order_by("id").values("id", "item", "quantity", "available")
+
+    totals["quantity"] = totals.pop("units")
+    totals["availability"] = [
+        {**line, "in_stock": line["available"] >= line["quantity"]}
+        for line in available
+    ]
+    totals["in_stock"] = all(
+        line["in_stock"] for line in totals["availability"]
+    )
+    return totals
+
+
+def new_basket_token() -> str:
+    return ANONYMOUS_BASKET_SIGNER.sign(uuid4().hex)
+
+
+def _anonymous_key(token):
+    try:
+        basket_id = ANONYMOUS_BASKET_SIGNER.unsign(
+            token or "",
+            max_age=ANONYMOUS_BASKET_TIMEOUT
+        )
+    except signing.BadSignature:
+        return None
+    return ANONYMOUS_BASKET_KEY.format(basket_id)
+
+
+def get_anonymous_basket(token):
+    """
+    The cached basket of ``token`` as ``{"next_id": ..., "lines": [...]}``,
+    empty for a new token, or None when the token is not valid.
+    """
+    key = _anonymous_key(token)
+    if key is None:
+        return None
+    return cache.get(key) or {"next_id": 1, "lines": []}
+
+
+def save_anonymous_basket(token, basket) -> None:
+    cache.set(_anonymous_key(token), basket, ANONYMOUS_BASKET_TIMEOUT)
+
+
+def merge_anonymous_basket(user, token):
+    """
+    Add the lines of the anonymous basket ``token`` to ``user``'s Basket
+    in one transaction and drop the cached copy. Returns the per-line
+    results of ``apply_basket_lines``, or None when there was nothing to
+    merge.
+    """
+    key = _anonymous_key(token)
+    basket = cache.get(key) if key else None
+    if not basket or not basket["lines"]:
+        return None
+    lines = [
+        {
+            name: line.get(name)
+            for name in ("item", "size", "color", "inventory", "quantity")
+        }
+        for line in basket["lines"]
+    ]
+    with transaction.atomic():
+        user_basket, _ = Basket.objects.get_or_create(user=user)
+        results = apply_basket_lines(user_basket, lines)
+    cache.delete(key)
+    return results
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import get_language
+from rest_framework.response import Response
+
+from .models import (
+    Category,
+    ImageItem,
+    Item,
+    ItemColor,
+    ItemDescription,
+    ItemInventory,
+    ItemSize,
+)
+
+RESPONSE_CACHE_TIMEOUT = 600
+RESPONSE_STATS_KEY = "store:stats:response:{}"
+
+# Tables whose writes bump a change version (see signals).
+VERSIONED_MODELS = (
+    Item,
+    ItemInventory,
+    ItemSize,
+    ItemColor,
+    Category,
+    ImageItem,
+    ItemDescription,
+)
+
+
+def versions_are_shared() -> bool:
+    """
+    Whether the change versions live in a cache that every process
+    shares. The per-process locmem fallback does not: a write committed
+    in a Celery worker would bump only the worker's copy and the web
+    process would keep serving what it cached before. Version-keyed
+    caches and validators are off without a shared backend.
+    """
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def _version_key(model) -> str:
+    return f"store:version:{model._meta.label_lower}"
+
+
+def _modified_key(model) -> str:
+    return f"store:modified:{model._meta.label_lower}"
+
+
+def _get_seeded(keys, seed) -> dict:
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, seed(), timeout=None)
+            values[key] = cache.get(key)
+    return values
+
+
+def get_versions(*models) -> list:
+    """
+    Return the current change version of each model's table.
+
+    A missing version (cold or evicted cache) is seeded from the clock,
+    so a reseeded table never reuses a version that older keys were
+    built from.
+    """
+    keys = [_version_key(model) for model in models]
+    versions = _get_seeded(keys, time.time_ns)
+    return [versions[key] for key in keys]
+
+
+def get_table_state(*models) -> tuple:
+    """
+    Return the change versions of ``models`` together with the latest
+    modification time (a POSIX timestamp) among them, in one cache
+    round trip.
+    """
+    version_keys = [_version_key(model) for model in models]
+    modified_keys = [_modified_key(model) for model in models]
+    values = _get_seeded(version_keys + modified_keys, time.time_ns)
+    return (
+        [values[key] for key in version_keys],
+        max(values[key] for key in modified_keys) / 1e9,
+    )
+
+
+def bump_version(*models) -> None:
+    now = time.time_ns()
+    for model in models:
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, now, timeout=None)
+        cache.set(_modified_key(model), now, timeout=None)
+
+
+def versioned_key(prefix: str, models, *parts) -> str:
+    """
+    Build a cache key that changes whenever any of ``models`` changes,
+    so invalidation is a version bump instead of a key scan.
+    """
+    payload = json.dumps(
+        [get_versions(*models), parts],
+        sort_keys=True,
+        default=str
+    )
+    digest = hashlib.md5(payload.encode()).hexdigest()
+    return f"store:{prefix}:{digest}"
+
+
+def _count(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_response(handler):
+    """
+    Serve anonymous, successful reads of ``handler`` from the cache.
+
+    The key covers the language, host, path and normalized query
+    params, and the versions of the view's ``conditional_models``,
+    so any write to those tables retires every cached page at once.
+    Responses carry ``X-Cache: HIT`` or ``X-Cache: MISS``. Nothing is
+    cached unless ``versions_are_shared``.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        if request.user.is_authenticated or not versions_are_shared():
+            return handler(self, request, *args, **kwargs)
+
+        params = sorted(
+            (name, sorted(value for value in values if value))
+            for name, values in request.query_params.lists()
+            if any(values)
+        )
+        key = versioned_key(
+            "response",
+            self.conditional_models,
+            get_language(),
+            request.get_host(),
+            request.path,
+            params,
+        )
+        data = cache.get(key)
+        if data is not None:
+            _count(RESPONSE_STATS_KEY.format("hits"))
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        _count(RESPONSE_STATS_KEY.format("misses"))
+        response = handler(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def get_response_stats() -> dict:
+    names = ("hits", "misses")
+    counters = cache.get_many([RESPONSE_STATS_KEY.format(n) for n in names])
+    return {
+        name: counters.get(RESPONSE_STATS_KEY.format(name), 0)
+        for name in names
+    }
+
+
+def reset_response_stats() -> None:
+    cache.delete_many([
+        RESPONSE_STATS_KEY.format(name) for name in ("hits", "misses")
+    ])
@@ -0,0 +1,152 @@
+"""
+Stripe checkout sessions through an outbox.
+
+An order that pays through Stripe gets a CheckoutOutbox entry in the same
+transaction as the order itself. The session is created only after that
+transaction commits, by ``process_checkout``: right after the request
+unless CHECKOUT_WORKER_ONLY is set, and by the ``process_checkout_outbox``
+command or Celery task for everything still pending. Stripe latency
+therefore never holds the order transaction or the inventory row locks.
+
+Workers claim an entry with one conditional UPDATE that pushes its
+``next_attempt_at`` past a lease, so any number of them can run at once
+without a transaction open across the Stripe call. Failed calls are
+retried with a growing delay until MAX_ATTEMPTS; every call for an order
+carries the same idempotency key, so a retry after a lost response gets
+the session Stripe already made.
+"""
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CheckoutOutbox, CheckoutStatus, Order, PaymentType
+
+MAX_ATTEMPTS = 5
+LEASE = timedelta(minutes=2)
+RETRY_DELAY = timedelta(seconds=30)
+DELIVERY_FEE_CENTS = 200
+
+SUCCESS_URL = "https://inst-store-api.onrender.com/success.html"
+CANCEL_URL = "https://inst-store-api.onrender.com/cancel.html"
+
+
+def enqueue_checkout(order: Order) -> CheckoutOutbox:
+    """Record that ``order`` needs a session; call it in its transaction."""
+    return CheckoutOutbox.objects.create(order=order)
+
+
+def line_items(order: Order) -> list:
+    """
+    Stripe line items of ``order``: its lines when paid by card, the
+    delivery fee for cash on delivery.
+    """
+    if order.payment_type == PaymentType.CARD:
+        return [
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {"name": line.item.name},
+                    "unit_amount": int(line.price * 100),
+                },
+                "quantity": line.quantity,
+            }
+            for line in order.items.select_related("item")
+        ]
+    return [{
+        "price_data": {
+            "currency": "usd",
+            "product_data": {
+                "name": "Delivery fee",
+                "description": "Delivery fee"
+            },
+            "unit_amount": DELIVERY_FEE_CENTS,
+        },
+        "quantity": 1,
+    }]
+
+
+def create_checkout_session(order: Order) -> str:
+    """Create the Stripe checkout session of ``order``; return its URL."""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.api_base = settings.STRIPE_API_BASE
+    session = stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=line_items(order),
+        mode="payment",
+        success_url=SUCCESS_URL,
+        cancel_url=CANCEL_URL,
+        metadata={
+            "order_id": order.id,
+        },
+        idempotency_key=f"checkout-order-{order.id}",
+    )
+    return session.url
+
+
+def _claim(entry_id: int, now) -> bool:
+    return bool(
+        CheckoutOutbox.objects.filter(
+            id=entry_id,
+            status=CheckoutStatus.PENDING,
+            next_attempt_at__lte=now,
+        ).update(next_attempt_at=now + LEASE, attempts=F("attempts") + 1)
+    )
+
+
+def process_checkout(entry_id: int, now=None) -> CheckoutOutbox:
+    """
+    Create the session of outbox entry ``entry_id`` if it is due and no
+    other worker holds it, and return the entry as it stands afterwards.
+    Must not be called inside a transaction.
+    """
+    now = now or timezone.now()
+    if _claim(entry_id, now):
+        entry = CheckoutOutbox.objects.select_related("order").get(
+            id=entry_id
+        )
+        try:
+            url = create_checkout_session(entry.order)
+        except Exception as e:
+            # Errors are kept on the entry and retried, never raised to
+            # the request that placed the order.
+            entry.last_error = str(e)
+            if entry.attempts >= MAX_ATTEMPTS:
+                entry.status = CheckoutStatus.FAILED
+            else:
+                entry.next_attempt_at = timezone.now() + RETRY_DELAY * (
+                    2 ** (entry.attempts - 1)
+                )
+            entry.save(
+                update_fields=["status", "next_attempt_at", "last_error"]
+            )
+            return entry
+        with transaction.atomic():
+            Order.objects.filter(id=entry.order_id).update(checkout_url=url)
+            entry.status = CheckoutStatus.READY
+            entry.last_error = ""
+            entry.save(update_fields=["status", "last_error"])
+        entry.order.checkout_url = url
+        return entry
+    return CheckoutOutbox.objects.select_related("order").get(id=entry_id)
+
+
+def process_pending_checkouts(limit: int = 100, now=None) -> int:
+    """
+    Process up to ``limit`` due outbox entries, oldest first, and return
+    how many sessions were created.
+    """
+    now = now or timezone.now()
+    due = list(
+        CheckoutOutbox.objects.filter(
+            status=CheckoutStatus.PENDING,
+            next_attempt_at__lte=now,
+        ).order_by("next_attempt_at").values_list("id", flat=True)[:limit]
+    )
+    return sum(
+        process_checkout(entry_id).status == CheckoutStatus.READY
+        for entry_id in due
+    )
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .cache import get_table_state, versions_are_shared
+
+
+def get_validators(request, models) -> tuple:
+    """
+    Return a strong ETag and a Last-Modified timestamp for ``request``
+    from the change versions of ``models``. The full path carries the
+    language prefix and the query string, so every language and filter
+    combination is validated separately. Versions only move once a write
+    has committed and its documents are rebuilt (see signals), so a new
+    ETag is never paired with the old body.
+    """
+    versions, last_modified = get_table_state(*models)
+    payload = json.dumps([
+        request.get_full_path(),
+        get_language(),
+        request.META.get("HTTP_ACCEPT", ""),
+        versions,
+    ])
+    etag = hashlib.sha1(payload.encode()).hexdigest()
+    return f'"{etag}"', int(last_modified)
+
+
+def conditional_get(handler):
+    """
+    Answer a matching ``If-None-Match`` / ``If-Modified-Since`` request
+    with 304 before ``handler`` runs, and attach the validators to the
+    full response otherwise. The view lists the tables its payload is
+    built from in ``conditional_models``. Without a shared version
+    store (see ``versions_are_shared``) no validators are sent, since
+    writes made in other processes would never change them.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        if not versions_are_shared():
+            return handler(self, request, *args, **kwargs)
+        etag, last_modified = get_validators(
+            request,
+            self.conditional_models
+        )
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None:
+            response = handler(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    return wrapper
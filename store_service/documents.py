@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import translation
+
+from .fastpath import ITEM_COLUMNS, serialize_items
+from .models import Item, ItemDocument
+from .serializers import ItemDetailSerializer, ItemSerializer
+
+REBUILD_CHUNK_SIZE = 500
+
+DOCUMENT_SERIALIZERS = {
+    "summary": ItemSerializer,
+    "detail": ItemDetailSerializer,
+}
+
+
+def render_documents(item_ids) -> list:
+    """Render every document kind of ``item_ids`` in every language."""
+    items = list(
+        ItemSerializer.setup_eager_loading(
+            Item.objects.filter(id__in=item_ids).order_by("id")
+        )
+    )
+    documents = []
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            rendered = {
+                kind: serializer_class(
+                    items,
+                    many=True,
+                    expand=serializer_class.Meta.expandable_fields
+                ).data
+                for kind, serializer_class in DOCUMENT_SERIALIZERS.items()
+            }
+        for index, item in enumerate(items):
+            documents.append(ItemDocument(
+                item=item,
+                language=language,
+                **{kind: data[index] for kind, data in rendered.items()},
+            ))
+    return documents
+
+
+def rebuild_item_documents(item_ids) -> int:
+    """
+    Re-render and store the documents of ``item_ids``, REBUILD_CHUNK_SIZE
+    items at a time, and return how many were written.
+    """
+    item_ids = sorted(item_ids)
+    written = 0
+    for start in range(0, len(item_ids), REBUILD_CHUNK_SIZE):
+        documents = render_documents(
+            item_ids[start:start + REBUILD_CHUNK_SIZE]
+        )
+        ItemDocument.objects.bulk_create(
+            documents,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["item", "language"],
+            update_fields=[*DOCUMENT_SERIALIZERS, "updated_at"],
+        )
+        written += len(documents)
+    return written
+
+
+def schedule_rebuild(item_ids, models=(), defer: bool = False) -> None:
+    """
+    Rebuild the documents of ``item_ids`` once the transaction commits.
+    With ASYNC_DOCUMENT_REBUILDS the rebuild runs on the Celery queue
+    instead of the request when ``defer`` is set or there are more than
+    DOCUMENT_REBUILD_SYNC_LIMIT items, and bumps the versions of
+    ``models`` after writing, as the on-commit bumps in ``signals`` do
+    for a rebuild made in place.
+    """
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    defer = defer or len(item_ids) > settings.DOCUMENT_REBUILD_SYNC_LIMIT
+    if defer and settings.ASYNC_DOCUMENT_REBUILDS:
+        from .utils import rebuild_item_documents_task
+
+        labels = [model._meta.label_lower for model in models]
+        transaction.on_commit(
+            lambda: rebuild_item_documents_task.delay(sorted(item_ids), labels)
+        )
+    else:
+        transaction.on_commit(lambda: rebuild_item_documents(item_ids))
+
+
+def _ordered(payload, field_names):
+    try:
+        return {name: payload[name] for name in field_names}
+    except (KeyError, TypeError):
+        return None
+
+
+def render_items(items, kind: str, context=None) -> list:
+    """
+    Return the ``kind`` payload of each of ``items`` in the active
+    language, read from the stored documents and cut down to the fields
+    the request asks for. ``items`` are Item instances or
+    ``values(*ITEM_COLUMNS)`` rows. Items without a current document are
+    rendered live instead.
+    """
+    serializer_class = DOCUMENT_SERIALIZERS[kind]
+    field_names = serializer_class.get_requested_fields(
+        (context or {}).get("request")
+    )
+    stored = ItemDocument.objects.filter(
+        item_id__in=[_pk(item) for item in items],
+        language=translation.get_language(),
+    ).values_list("item_id", kind)
+
+    payloads = {}
+    for item_id, payload in stored:
+        payload = _ordered(payload, field_names)
+        if payload is not None:
+            payloads[item_id] = payload
+
+    missing = [item for item in items if _pk(item) not in payloads]
+    if missing:
+        payloads.update(zip(
+            map(_pk, missing),
+            _render_live(serializer_class, missing, field_names, context)
+        ))
+    return [payloads[_pk(item)] for item in items]
+
+
+def _pk(item):
+    return item["id"] if isinstance(item, dict) else item.id
+
+
+def _render_live(serializer_class, items, field_names, context):
+    if settings.FAST_SERIALIZATION:
+        if not isinstance(items[0], dict):
+            rows = {
+                row["id"]: row
+                for row in Item.objects.filter(
+                    id__in=[item.id for item in items]
+                ).values(*ITEM_COLUMNS)
+            }
+            items = [rows[item.id] for item in items]
+        return serialize_items(items, field_names)
+    prefetch_related_objects(
+        items,
+        *serializer_class.get_prefetch_lookups(field_names)
+    )
+    return serializer_class(items, many=True, context=context).data
@@ -0,0 +1,71 @@
+from django.db.models import Count, Q
+
+from .models import Category, Item, ItemColor, ItemInventory, ItemSize
+
+FACET_MODELS = (Item, ItemInventory, ItemSize, ItemColor, Category)
+FACETS_CACHE_TIMEOUT = 60 * 15
+
+
+def _counts(rows, key, labels) -> list:
+    return [
+        {"id": row[key], "value": str(labels[row[key]]), "count": row["count"]}
+        for row in rows
+        if row[key] in labels
+    ]
+
+
+def item_facets(queryset) -> dict:
+    """
+    Count the items of ``queryset`` per size, colour, brand, category,
+    sale and stock state with one grouped query per facet.
+    """
+    items = Item.objects.filter(id__in=queryset.values("id")).order_by()
+    inventory = ItemInventory.objects.filter(
+        item__in=queryset.values("id")
+    ).order_by()
+
+    totals = items.aggregate(
+        total=Count("id"),
+        sale=Count("id", filter=Q(sale=True)),
+        in_stock=Count("id", filter=Q(in_stock=True)),
+    )
+    sizes = list(
+        inventory.values("size_id")
+        .annotate(count=Count("item_id", distinct=True))
+    )
+    colors = list(
+        inventory.values("color_id")
+        .annotate(count=Count("item_id", distinct=True))
+    )
+    categories = list(
+        items.values("category_id").annotate(count=Count("id"))
+    )
+    brands = items.exclude(brand__isnull=True).exclude(brand="").values(
+        "brand"
+    ).annotate(count=Count("id")).order_by("brand")
+
+    size_labels = ItemSize.objects.in_bulk([row["size_id"] for row in sizes])
+    color_labels = ItemColor.objects.in_bulk(
+        [row["color_id"] for row in colors]
+    )
+    category_labels = Category.objects.in_bulk(
+        [row["category_id"] for row in categories]
+    )
+
+    return {
+        "total": totals["total"],
+        "sale": {
+            "true": totals["sale"],
+            "false": totals["total"] - totals["sale"],
+        },
+        "in_stock": {
+            "true": totals["in_stock"],
+            "false": totals["total"] - totals["in_stock"],
+        },
+        "sizes": _counts(sizes, "size_id", size_labels),
+        "colors": _counts(colors, "color_id", color_labels),
+        "brands": [
+            {"value": row["brand"], "count": row["count"]} for row in brands
+        ],
+        "categories": _counts(categories, "category_id", category_labels),
+    }
@@ -0,0 +1,227 @@
+"""
+Plain-dict renderers for the item and order lists.
+
+They start from ``values()`` rows, load each relation once for the whole
+page, and build the same payloads as ItemSerializer, ItemDetailSerializer
+and OrderSerializer without binding a DRF field per value. Enabled with
+the FAST_SERIALIZATION setting.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from .models import (
+    AVAILABLE,
+    DeliveryInfo,
+    ImageItem,
+    Item,
+    ItemColor,
+    ItemDescription,
+    ItemInventory,
+    ItemSize,
+    OrderItem,
+    PostDepartment,
+)
+
+ITEM_COLUMNS = (
+    "id",
+    "sale_price",
+    "brand",
+    "date_added",
+    "fabric",
+    "name",
+    "price",
+    "effective_price",
+    "category",
+    "sale",
+    "in_stock",
+)
+ORDER_COLUMNS = ("id", "user", "payment_type", "post_department")
+
+CENT = Decimal("0.01")
+IMAGE_STORAGE = ImageItem._meta.get_field("image").storage
+
+
+def _decimal(value):
+    return None if value is None else f"{value.quantize(CENT):f}"
+
+
+def _image_url(name) -> str:
+    if not name:
+        raise ValueError(
+            "The 'image' attribute has no file associated with it."
+        )
+    return IMAGE_STORAGE.url(name)
+
+
+def _group(rows) -> dict:
+    grouped = {}
+    for key, *values in rows:
+        grouped.setdefault(key, []).append(values)
+    return grouped
+
+
+def _labels(model, field: str, ids) -> dict:
+    return dict(
+        model.objects.filter(id__in=set(ids)).values_list("id", field)
+    )
+
+
+def iter_chunks(queryset, size: int = 1000):
+    """Yield lists of up to ``size`` rows from a server-side cursor."""
+    chunk = []
+    for row in queryset.iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def serialize_items(rows, field_names) -> list:
+    """
+    Render ``rows`` (``Item.objects.values(*ITEM_COLUMNS)``) as item
+    payloads with ``field_names``, loading only the relations those
+    fields need.
+    """
+    rows = list(rows)
+    item_ids = [row["id"] for row in rows]
+    names = set(field_names)
+
+    images = descriptions = inventory = {}
+    if names & {"image", "images"}:
+        images = _group(
+            ImageItem.objects.filter(item_id__in=item_ids)
+            .order_by("id")
+            .values_list("item_id", "image")
+        )
+    if "description" in names:
+        descriptions = _group(
+            ItemDescription.objects.filter(item_id__in=item_ids)
+            .order_by("id")
+            .values_list("item_id", "title", "description")
+        )
+    if "additional_info" in names:
+        inventory = _group(
+            ItemInventory.objects.filter(item_id__in=item_ids)
+            .order_by("id")
+            .values_list("item_id", "size_id", "color_id", AVAILABLE)
+        )
+        variants = [row for rows in inventory.values() for row in rows]
+        sizes = _labels(ItemSize, "size", [row[0] for row in variants])
+        colors = _labels(ItemColor, "color", [row[1] for row in variants])
+
+    def image(row):
+        first = images.get(row["id"])
+        return _image_url(first[0][0]) if first else None
+
+    builders = {
+        "id": lambda row: row["id"],
+        "sale_price": lambda row: _decimal(row["sale_price"]),
+        "brand": lambda row: row["brand"],
+        "date_added": lambda row: row["date_added"].isoformat(),
+        "fabric": lambda row: row["fabric"],
+        "image": image,
+        "images": lambda row: [
+            _image_url(name) for name, in images.get(row["id"], [])
+        ],
+        "name": lambda row: row["name"],
+        "description": lambda row: [
+            {"title": title, "description": description}
+            for title, description in descriptions.get(row["id"], [])
+        ],
+        "price": lambda row: _decimal(row["price"]),
+        "effective_price": lambda row: _decimal(row["effective_price"]),
+        "category": lambda row: row["category"],
+        "sale": lambda row: row["sale"],
+        "in_stock": lambda row: row["in_stock"],
+        "additional_info": lambda row: [
+            {"size": sizes[size], "color": colors[color], "amount": amount}
+            for size, color, amount in inventory.get(row["id"], [])
+        ],
+    }
+    fields = [(name, builders[name]) for name in field_names]
+    return [{name: build(row) for name, build in fields} for row in rows]
+
+
+def serialize_orders(rows, field_names) -> list:
+    """
+    Render ``rows`` (``Order.objects.values(*ORDER_COLUMNS)``) as
+    OrderSerializer payloads with ``field_names``.
+    """
+    rows = list(rows)
+    order_ids = [row["id"] for row in rows]
+    names = set(field_names)
+
+    users = items = deliveries = departments = {}
+    if "user" in names:
+        users = {
+            user["id"]: user
+            for user in get_user_model().objects.filter(
+                id__in={row["user"] for row in rows}
+            ).values("id", "email", "is_staff", "is_email_verified")
+        }
+    if "items" in names:
+        items = _group(
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by("id")
+            .values_list(
+                "order_id",
+                "item_id",
+                "price",
+                "size_id",
+                "color_id",
+                "quantity"
+            )
+        )
+        lines = [line for lines in items.values() for line in lines]
+        item_names = _labels(Item, "name", [line[0] for line in lines])
+        sizes = _labels(ItemSize, "size", [line[2] for line in lines])
+        colors = _labels(ItemColor, "color", [line[3] for line in lines])
+    if "delivery_info" in names:
+        deliveries = {
+            info.pop("order_id"): info
+            for info in DeliveryInfo.objects.filter(
+                order_id__in=order_ids
+            ).values(
+                "order_id",
+                "full_name",
+                "number",
+                "email",
+                "comments",
+                "delivery_type",
+            )
+        }
+    if "post_department" in names:
+        departments = {
+            department["id"]: department
+            for department in PostDepartment.objects.filter(
+                id__in={row["post_department"] for row in rows}
+            ).values("id", "city", "state", "address")
+        }
+
+    builders = {
+        "id": lambda row: row["id"],
+        "user": lambda row: dict(users[row["user"]]),
+        "items": lambda row: [
+            {
+                "item": item_names[item_id],
+                "price": _decimal(price),
+                "size": sizes.get(size_id),
+                "color": colors.get(color_id),
+                "quantity": quantity,
+            }
+            for item_id, price, size_id, color_id, quantity
+            in items.get(row["id"], [])
+        ],
+        "payment_type": lambda row: row["payment_type"],
+        "delivery_info": lambda row: (
+            dict(deliveries[row["id"]]) if row["id"] in deliveries else None
+        ),
+        "post_department": lambda row: dict(
+            departments[row["post_department"]]
+        ),
+    }
+    fields = [(name, builders[name]) for name in field_names]
+    return [{name: build(row) for name, build in fields} for row in rows]
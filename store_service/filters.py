@@ -0,0 +1,79 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from .models import ItemColor, ItemInventory
+from .search import search_items
+
+FILTER_PARAMS = (
+    "size",
+    "color",
+    "brand",
+    "sale",
+    "in_stock",
+    "min_price",
+    "max_price",
+    "q",
+)
+
+
+def _price_param(params, name):
+    value = params.get(name, None)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        price = None
+    if price is None or not price.is_finite():
+        raise ValidationError({name: "A valid number is required."})
+    return price
+
+
+def filter_items(queryset, params):
+    """Apply the catalog filters shared by the item list and its facets."""
+    size = params.get("size", None)
+    color = params.get("color", None)
+    if size or color:
+        variants = ItemInventory.objects.filter(item=OuterRef("pk"))
+        if size:
+            variants = variants.filter(size__size=size)
+        if color:
+            variants = variants.filter(
+                color__in=ItemColor.objects.filter(color=color)
+            )
+        queryset = queryset.filter(Exists(variants))
+    brand = params.get("brand", None)
+    if brand:
+        queryset = queryset.filter(brand__icontains=brand)
+    sale = params.get("sale", None)
+    if sale:
+        sale = sale.lower() == "true"
+        queryset = queryset.filter(sale=sale)
+    in_stock = params.get("in_stock", None)
+    if in_stock:
+        in_stock = in_stock.lower() == "true"
+        queryset = queryset.filter(in_stock=in_stock)
+    min_price = _price_param(params, "min_price")
+    if min_price is not None:
+        queryset = queryset.filter(effective_price__gte=min_price)
+    max_price = _price_param(params, "max_price")
+    if max_price is not None:
+        queryset = queryset.filter(effective_price__lte=max_price)
+    query = params.get("q", None)
+    if query:
+        queryset = search_items(queryset, query).order_by("-search_rank")
+    return queryset
+
+
+def order_items(queryset, params):
+    ordering = params.get("ordering", None)
+    if ordering:
+        if ordering.lower() == "newest":
+            queryset = queryset.order_by("-id")
+        elif ordering.lower() == "cheaper":
+            queryset = queryset.order_by("effective_price")
+        elif ordering.lower() == "exp":
+            queryset = queryset.order_by("-effective_price")
+    return queryset
@@ -0,0 +1,102 @@
+import random
+from decimal import Decimal
+
+from store_service.models import (
+    Category,
+    Item,
+    ItemColor,
+    ItemDescription,
+    ItemInventory,
+    ItemSize,
+)
+
+WORDS = [
+    "linen", "cotton", "wool", "silk", "denim", "velvet", "classic",
+    "summer", "winter", "oversized", "slim", "cropped", "striped",
+    "shirt", "dress", "jacket", "coat", "skirt", "trousers", "sweater",
+]
+WORDS_UK = [
+    "льон", "бавовна", "вовна", "шовк", "сорочка", "сукня", "куртка",
+    "пальто", "спідниця", "штани", "светр", "літня", "зимова",
+]
+WORDS_RO = [
+    "in", "bumbac", "lana", "matase", "camasa", "rochie", "jacheta",
+    "palton", "fusta", "pantaloni", "pulover", "vara", "iarna",
+]
+BRANDS = [f"Brand{number:03d}" for number in range(300)]
+
+
+def build_catalog(size: int, seed: int = 0, batch_size: int = 5000) -> list:
+    """
+    Insert ``size`` synthetic items with descriptions and two inventory
+    variants each, returning the new item ids. Meant to be run inside a
+    transaction that the caller rolls back.
+    """
+    rng = random.Random(seed)
+
+    def phrase(words, length=3):
+        return " ".join(rng.choice(words) for _ in range(length))
+
+    categories = Category.objects.bulk_create(
+        Category(name=f"Synthetic {number}", description="")
+        for number in range(20)
+    )
+    sizes = ItemSize.objects.bulk_create(
+        ItemSize(size=size) for size in ("XS", "S", "M", "L", "XL")
+    )
+    colors = ItemColor.objects.bulk_create(
+        ItemColor(color=color)
+        for color in ("black", "white", "red", "blue", "green")
+    )
+
+    items = []
+    for _ in range(size):
+        price = Decimal(rng.randrange(500, 50000)) / 100
+        sale = rng.random() < 0.2
+        name = phrase(WORDS).capitalize()
+        items.append(Item(
+            name=name,
+            name_en=name,
+            name_uk=phrase(WORDS_UK),
+            name_ro=phrase(WORDS_RO),
+            brand=rng.choice(BRANDS),
+            fabric=rng.choice(WORDS[:6]),
+            price=price,
+            sale=sale,
+            sale_price=(price * Decimal("0.7")).quantize(Decimal("0.01"))
+            if sale else None,
+            category=rng.choice(categories),
+        ))
+    items = Item.objects.bulk_create(items, batch_size=batch_size)
+
+    ItemDescription.objects.bulk_create(
+        (
+            ItemDescription(
+                item=item,
+                title=phrase(WORDS, 2),
+                title_en=phrase(WORDS, 2),
+                description=phrase(WORDS, 12),
+                description_en=phrase(WORDS, 12),
+                description_uk=phrase(WORDS_UK, 12),
+            )
+            for item in items
+        ),
+        batch_size=batch_size,
+    )
+    ItemInventory.objects.bulk_create(
+        (
+            ItemInventory(
+                item=item,
+                size=size,
+                color=color,
+                quantity=rng.randrange(0, 10),
+            )
+            for item in items
+            for size, color in zip(
+                rng.sample(sizes, 2),
+                rng.sample(colors, 2)
+            )
+        ),
+        batch_size=batch_size,
+    )
+    return [item.id for item in items]
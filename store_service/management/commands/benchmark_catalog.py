@@ -0,0 +1,305 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import translation
+from django.utils.http import urlencode
+from rest_framework.renderers import JSONRenderer
+
+from store_service.filters import filter_items, order_items
+from store_service.fastpath import (
+    ITEM_COLUMNS,
+    ORDER_COLUMNS,
+    iter_chunks,
+    serialize_items,
+    serialize_orders,
+)
+from store_service.models import (
+    DeliveryInfo,
+    ImageItem,
+    Item,
+    ItemInventory,
+    Order,
+    OrderItem,
+    PostDepartment,
+)
+from store_service.renderers import FastJSONRenderer, dumps
+from store_service.pagination import KeysetPagination
+from store_service.search import index_items, search_items, trigram_indexes
+from store_service.serializers import (
+    ItemDetailSerializer,
+    ItemSerializer,
+    OrderSerializer,
+)
+
+from ._synthetic import build_catalog
+
+
+def timed(func, repeat: int = 5) -> float:
+    """Best wall time of ``repeat`` runs, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def traced(func) -> tuple:
+    """Wall time in milliseconds and peak traced memory in MiB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark catalog queries against a synthetic catalog. "
+        "All synthetic rows are rolled back when the run finishes."
+    )
+    suites = ("search", "serializers", "rendering", "indexes")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items",
+            type=int,
+            default=100_000,
+            help="Size of the synthetic catalog.",
+        )
+        parser.add_argument(
+            "--suite",
+            action="append",
+            choices=self.suites,
+            help="Suite to run (repeatable, default: all).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            item_ids = build_catalog(options["items"])
+            self.stdout.write(
+                f"Built {len(item_ids)} items "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+            for suite in options["suite"] or self.suites:
+                self.stdout.write(self.style.MIGRATE_HEADING(suite))
+                getattr(self, f"run_{suite}")(item_ids)
+            transaction.set_rollback(True)
+
+    def report(self, label: str, milliseconds: float) -> None:
+        self.stdout.write(f"  {label:<48} {milliseconds:>10.2f} ms")
+
+    def run_search(self, item_ids):
+        start = time.perf_counter()
+        for offset in range(0, len(item_ids), 2000):
+            index_items(item_ids[offset:offset + 2000])
+        self.report("index build", (time.perf_counter() - start) * 1000)
+
+        for term in ("linen", "silk dress", "сукня", "Brand042"):
+            self.report(
+                f"q={term!r} top 20",
+                timed(lambda: list(
+                    search_items(Item.objects.all(), term)
+                    .order_by("-search_rank", "-id")
+                    .values_list("id", flat=True)[:20]
+                )),
+            )
+            self.report(
+                f"q={term!r} count",
+                timed(lambda: search_items(Item.objects.all(), term).count()),
+            )
+        self.report(
+            "brand__contains='Brand042' (old filter) count",
+            timed(lambda: Item.objects.filter(
+                brand__contains="Brand042"
+            ).count()),
+        )
+        self.report(
+            "name__icontains='silk' (unindexed scan) count",
+            timed(lambda: Item.objects.filter(name__icontains="silk").count()),
+        )
+
+    def compare(self, label, rows, drf, fast) -> None:
+        """Check byte parity of two renderers and report both per 1k."""
+        renderer = JSONRenderer()
+        if renderer.render(drf()) != renderer.render(fast()):
+            raise CommandError(f"Fast path output differs: {label}")
+        per_1k = 1000 / rows
+        self.report(f"{label} DRF / 1k rows", timed(drf, 3) * per_1k)
+        self.report(f"{label} fast / 1k rows", timed(fast, 3) * per_1k)
+
+    def run_serializers(self, item_ids):
+        sample = item_ids[:1000]
+        ImageItem.objects.bulk_create(
+            ImageItem(item_id=item_id, image=f"items/{item_id}-{number}.jpg")
+            for item_id in sample
+            for number in range(2)
+        )
+        items = Item.objects.filter(id__in=sample).order_by("id")
+
+        for serializer_class in (ItemSerializer, ItemDetailSerializer):
+            for expand in ((), serializer_class.Meta.expandable_fields):
+                names = serializer_class.get_requested_fields(expand=expand)
+                for language, _ in settings.LANGUAGES:
+                    with translation.override(language):
+                        self.compare(
+                            f"{serializer_class.__name__} "
+                            f"expand={list(expand)} {language}",
+                            len(sample),
+                            lambda: serializer_class(
+                                serializer_class.setup_eager_loading(
+                                    items,
+                                    names
+                                ),
+                                many=True,
+                                expand=expand
+                            ).data,
+                            lambda: serialize_items(
+                                items.values(*ITEM_COLUMNS),
+                                names
+                            ),
+                        )
+
+        user = get_user_model().objects.create(
+            email="benchmark@example.invalid"
+        )
+        department = PostDepartment.objects.create(city="Kyiv")
+        orders = Order.objects.bulk_create(
+            Order(user=user, payment_type="card", post_department=department)
+            for _ in range(len(sample))
+        )
+        DeliveryInfo.objects.bulk_create(
+            DeliveryInfo(order=order, full_name="Benchmark", number="1")
+            for order in orders[::2]
+        )
+        variants = list(
+            ItemInventory.objects.filter(item_id__in=sample)
+            .values_list("item_id", "size_id", "color_id")[:3000]
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                item_id=item_id,
+                size_id=size_id,
+                color_id=color_id,
+                price=index,
+                quantity=1,
+            )
+            for index, order in enumerate(orders)
+            for item_id, size_id, color_id in variants[index:index + 3]
+        )
+        queryset = Order.objects.filter(user=user).order_by("-id")
+        for expand in ((), OrderSerializer.Meta.expandable_fields):
+            names = OrderSerializer.get_requested_fields(expand=expand)
+            self.compare(
+                f"OrderSerializer expand={list(expand)}",
+                len(orders),
+                lambda: OrderSerializer(
+                    OrderSerializer.setup_eager_loading(queryset, names),
+                    many=True,
+                    expand=expand
+                ).data,
+                lambda: serialize_orders(
+                    queryset.values(*ORDER_COLUMNS),
+                    names
+                ),
+            )
+
+    def run_rendering(self, item_ids):
+        rows = Item.objects.order_by("id").values(*ITEM_COLUMNS)
+        names = ItemSerializer.get_requested_fields()
+
+        payloads = serialize_items(rows, names)
+        if dumps(payloads) != JSONRenderer().render(payloads):
+            raise CommandError("FastJSONRenderer output differs from DRF.")
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            self.report(
+                f"{type(renderer).__name__}.render only",
+                timed(lambda: renderer.render(payloads), 1),
+            )
+        payloads = None
+
+        def render_with(renderer):
+            return lambda: renderer.render(serialize_items(rows, names))
+
+        def stream():
+            for _ in FastJSONRenderer.iter_render(
+                serialize_items(chunk, names) for chunk in iter_chunks(rows)
+            ):
+                pass
+
+        for label, func in (
+            ("JSONRenderer, whole list", render_with(JSONRenderer())),
+            ("FastJSONRenderer, whole list", render_with(FastJSONRenderer())),
+            ("FastJSONRenderer, streamed", stream),
+        ):
+            elapsed, peak = traced(func)
+            self.report(f"{label} ({len(item_ids)} rows)", elapsed)
+            self.stdout.write(f"  {'':<48} {peak:>10.1f} MiB peak")
+
+    def run_indexes(self, item_ids):
+        category = Item.objects.get(id=item_ids[0]).category_id
+        cases = [
+            {"ordering": "newest"},
+            {"sale": "true", "ordering": "cheaper"},
+            {"in_stock": "true", "ordering": "exp"},
+            {"category": category, "ordering": "cheaper"},
+            {"min_price": "100", "max_price": "120", "ordering": "cheaper"},
+            {"size": "M", "color": "red"},
+            {"brand": "brand04"},
+        ]
+
+        def page(params):
+            queryset = order_items(
+                filter_items(Item.objects.all(), params),
+                params
+            )
+            if "category" in params:
+                queryset = queryset.filter(category_id=params["category"])
+            ordering = KeysetPagination().get_ordering(None, queryset, None)
+            return queryset.order_by(*ordering)[:21]
+
+        def run(heading):
+            self.stdout.write(heading)
+            for params in cases:
+                queryset = page(params).values_list("id", flat=True)
+                self.report(
+                    urlencode(params),
+                    timed(lambda: list(queryset.all()))
+                )
+                # The comment keeps SQLite from reusing a cached plan.
+                sql, sql_params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"{connection.ops.explain_query_prefix()} "
+                        f"/* {heading} */ {sql}",
+                        sql_params,
+                    )
+                    for row in cursor.fetchall():
+                        self.stdout.write(f"      {row[-1]}")
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        run("With the index set:")
+
+        indexes = [
+            index.name
+            for model in (Item, ItemInventory, OrderItem)
+            for index in model._meta.indexes
+        ]
+        if connection.vendor == "postgresql":
+            indexes += list(trigram_indexes())
+        with connection.cursor() as cursor:
+            for name in indexes:
+                cursor.execute(
+                    f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}"
+                )
+        run("Without it (primary key, foreign key and unique indexes):")
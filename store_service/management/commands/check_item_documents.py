@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store_service.documents import (
+    DOCUMENT_SERIALIZERS,
+    rebuild_item_documents,
+    render_documents,
+)
+from store_service.models import Item, ItemDocument
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stored item documents with the live serializers "
+        "and report missing, stale and orphaned documents."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of items compared per batch.",
+        )
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Re-render the items whose documents are inconsistent.",
+        )
+
+    def handle(self, *args, **options):
+        item_ids = list(
+            Item.objects.order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+        kinds = list(DOCUMENT_SERIALIZERS)
+
+        missing = stale = 0
+        broken = set()
+        for start in range(0, len(item_ids), batch_size):
+            batch = item_ids[start:start + batch_size]
+            stored = {
+                (item_id, language): documents
+                for item_id, language, *documents in
+                ItemDocument.objects.filter(item_id__in=batch).values_list(
+                    "item_id", "language", *kinds
+                )
+            }
+            for document in render_documents(batch):
+                key = (document.item_id, document.language)
+                expected = [getattr(document, kind) for kind in kinds]
+                if key not in stored:
+                    missing += 1
+                    broken.add(document.item_id)
+                elif stored[key] != expected:
+                    stale += 1
+                    broken.add(document.item_id)
+                    self.stdout.write(
+                        f"Stale document: item {key[0]} ({key[1]})"
+                    )
+
+        orphaned = ItemDocument.objects.exclude(
+            item_id__in=Item.objects.values("id")
+        ).count()
+
+        self.stdout.write(
+            f"Checked {len(item_ids)} items: {missing} missing, "
+            f"{stale} stale, {orphaned} orphaned documents."
+        )
+        if options["repair"] and broken:
+            broken = sorted(broken)
+            for start in range(0, len(broken), batch_size):
+                rebuild_item_documents(broken[start:start + batch_size])
+            self.stdout.write(
+                self.style.SUCCESS(f"Re-rendered {len(broken)} items.")
+            )
+        elif missing or stale:
+            raise CommandError("Item documents are out of date.")
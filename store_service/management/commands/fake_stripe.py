@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+SESSIONS_PATH = "/v1/checkout/sessions"
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """
+    Answers checkout session creation like the Stripe API, with the
+    latency and failures the server was started with. Repeated
+    Idempotency-Key headers get the session made for the first request.
+    """
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path != SESSIONS_PATH:
+            return self.respond(404, {"error": {
+                "type": "invalid_request_error",
+                "message": f"Unrecognized request URL (POST: {self.path})",
+            }})
+
+        time.sleep(server.delay)
+        with server.lock:
+            server.requests += 1
+            failing = server.requests <= server.fail
+        if failing:
+            return self.respond(500, {"error": {
+                "type": "api_error",
+                "message": "Fake Stripe failure.",
+            }})
+
+        key = self.headers.get("Idempotency-Key") or uuid4().hex
+        with server.lock:
+            session = server.sessions.get(key)
+            if session is None:
+                params = dict(parse_qsl(body.decode()))
+                session_id = f"cs_test_{uuid4().hex}"
+                session = server.sessions[key] = {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "mode": params.get("mode"),
+                    "metadata": {
+                        name[len("metadata["):-1]: value
+                        for name, value in params.items()
+                        if name.startswith("metadata[")
+                    },
+                    "url": f"{server.base_url}/pay/{session_id}",
+                }
+        self.respond(200, session)
+
+    def respond(self, status: int, data: dict) -> None:
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """
+    The fake API on ``port`` (0 picks a free one). Tests can run it with
+    ``serve_forever`` in a thread and point STRIPE_API_BASE at
+    ``base_url``.
+    """
+
+    def __init__(self, port: int = 0, delay: float = 0.0, fail: int = 0):
+        super().__init__(("127.0.0.1", port), FakeStripeHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_port}"
+        self.delay = delay
+        self.fail = fail
+        self.requests = 0
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a fake Stripe API that creates checkout sessions, for "
+        "running checkouts offline. Set STRIPE_API_BASE to its address."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=12111,
+            help="Port to listen on.",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0.0,
+            help="Seconds to wait before answering each request.",
+        )
+        parser.add_argument(
+            "--fail",
+            type=int,
+            default=0,
+            help="Answer the first N session requests with a 500 error.",
+        )
+
+    def handle(self, *args, **options):
+        server = FakeStripeServer(
+            options["port"],
+            options["delay"],
+            options["fail"]
+        )
+        self.stdout.write(
+            f"Fake Stripe API on {server.base_url} "
+            f"(STRIPE_API_BASE={server.base_url})"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store_service.checkout import process_pending_checkouts
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the Stripe checkout sessions of orders waiting in the "
+        "checkout outbox. Safe to run in several processes and next to "
+        "the Celery beat task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Number of outbox entries processed per pass.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of making one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds between passes with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            created = process_pending_checkouts(limit=options["limit"])
+            if created or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Created {created} checkout sessions."
+                    )
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from store_service.models import Item
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute denormalized stock and effective price columns for the "
+        "whole catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of item ids updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bounds = Item.objects.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            self.stdout.write("No items to rebuild.")
+            return
+
+        updated = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            items = Item.objects.filter(
+                id__gte=start,
+                id__lt=start + batch_size
+            )
+            items.refresh_effective_price()
+            updated += items.refresh_stock()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt stock and prices; stock changed on {updated} "
+                f"items."
+            )
+        )
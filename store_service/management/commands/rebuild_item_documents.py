@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from store_service.documents import rebuild_item_documents
+from store_service.models import Item
+
+
+class Command(BaseCommand):
+    help = "Re-render the stored item documents for the whole catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of items rendered per batch.",
+        )
+
+    def handle(self, *args, **options):
+        item_ids = list(
+            Item.objects.order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+
+        written = 0
+        for start in range(0, len(item_ids), batch_size):
+            written += rebuild_item_documents(
+                item_ids[start:start + batch_size]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {written} documents for {len(item_ids)} items."
+            )
+        )
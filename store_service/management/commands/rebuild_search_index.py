@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from store_service.models import Item
+from store_service.search import index_items, install_search_index
+
+
+class Command(BaseCommand):
+    help = "Create the catalog full-text index and reindex every item."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of items indexed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        install_search_index()
+        item_ids = Item.objects.order_by("id").values_list("id", flat=True)
+
+        indexed = 0
+        batch = []
+        for item_id in item_ids.iterator():
+            batch.append(item_id)
+            if len(batch) == options["batch_size"]:
+                index_items(batch)
+                indexed += len(batch)
+                batch = []
+        index_items(batch)
+        indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} items."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from store_service.stock import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Give back the stock held by basket lines whose hold has expired. "
+        "Safe to run from cron next to the Celery beat task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of basket lines released per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired_holds(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired holds.")
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from store_service.cache import get_response_stats, reset_response_stats
+
+
+class Command(BaseCommand):
+    help = "Show the hit and miss counters of the catalog response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_response_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0.0
+        self.stdout.write(
+            f"Hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"hit ratio: {ratio:.1%}"
+        )
+        if options["reset"]:
+            reset_response_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
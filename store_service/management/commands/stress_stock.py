@@ -0,0 +1,209 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+
+from store_service.models import (
+    Basket,
+    BasketItem,
+    Category,
+    Item,
+    ItemColor,
+    ItemInventory,
+    ItemSize,
+)
+from store_service.stock import (
+    InsufficientStock,
+    StockConflict,
+    atomic_with_retry,
+    hold_stock,
+    take_stock_for_lines,
+)
+
+
+def take_naive(quantity: int, **lookup) -> None:
+    """The read-check-save pattern the views used before ``stock``."""
+    inventory = ItemInventory.objects.get(**lookup)
+    if inventory.quantity < quantity:
+        raise InsufficientStock(quantity)
+    inventory.quantity -= quantity
+    inventory.save()
+
+
+def naive(inventory, quantity: int):
+    return lambda: take_naive(quantity, id=inventory.id)
+
+
+def hold(inventory, quantity: int):
+    """Basket adds: reserve units with ``hold_stock``."""
+    return lambda: hold_stock(quantity, id=inventory.id)
+
+
+def checkout(inventory, quantity: int):
+    """
+    Checkouts: sell an unheld basket line with ``take_stock_for_lines``,
+    retried on lock errors as the order view does.
+    """
+    user = get_user_model().objects.create(
+        email=f"stress-{inventory.id}@example.invalid"
+    )
+    line = BasketItem.objects.create(
+        basket=Basket.objects.create(user=user),
+        item=inventory.item,
+        size=inventory.size,
+        color=inventory.color,
+        quantity=quantity,
+    )
+
+    return lambda: atomic_with_retry(take_stock_for_lines, [line])
+
+
+class Command(BaseCommand):
+    help = (
+        "Take stock from one inventory row in concurrent threads through "
+        "the basket hold and checkout paths, and check that none is "
+        "oversold and no take fails with an unhandled database error. "
+        "Needs a file-backed or server database; its rows are deleted "
+        "when the run finishes."
+    )
+    strategies = {"hold": hold, "checkout": checkout, "naive": naive}
+    safe = ("hold", "checkout")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Concurrent workers.",
+        )
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=200,
+            help="Units on the inventory row at the start.",
+        )
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=50,
+            help="Takes per worker.",
+        )
+        parser.add_argument(
+            "--quantity",
+            type=int,
+            default=1,
+            help="Units per take.",
+        )
+        parser.add_argument(
+            "--strategy",
+            action="append",
+            choices=self.strategies,
+            help="Strategy to run (repeatable, default: hold and checkout).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError(
+                "Workers need their own connections to one database; "
+                "an in-memory SQLite database cannot be shared."
+            )
+        outcomes = {}
+        for name in options["strategy"] or self.safe:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            outcomes[name] = self.run(self.strategies[name], options)
+        failed = {
+            name: outcome for name, outcome in outcomes.items()
+            if name in self.safe
+            and (outcome["oversold"] or outcome["errors"])
+        }
+        if failed:
+            raise CommandError(f"Stock was oversold or takes failed: {failed}")
+
+    def run(self, strategy, options) -> dict:
+        category = Category.objects.create(name="Stress", description="")
+        size = ItemSize.objects.create(size="Stress")
+        color = ItemColor.objects.create(color="Stress")
+        users = get_user_model().objects.filter(
+            email__startswith="stress-",
+            email__endswith="@example.invalid"
+        )
+        try:
+            inventory = ItemInventory.objects.create(
+                item=Item.objects.create(
+                    name="Stress item",
+                    price=Decimal("1.00"),
+                    category=category
+                ),
+                size=size,
+                color=color,
+                quantity=options["stock"],
+            )
+            take = strategy(inventory, options["quantity"])
+            results, elapsed = self.hammer(take, options)
+            inventory.refresh_from_db()
+        finally:
+            users.delete()
+            category.delete()
+            size.delete()
+            color.delete()
+
+        # Units gone from the row, sold or held; any take that was counted
+        # but not recorded here was oversold.
+        taken = options["stock"] - inventory.quantity + inventory.reserved
+        oversold = results["sold"] - taken
+        if inventory.reserved > inventory.quantity:
+            oversold = max(oversold, inventory.reserved - inventory.quantity)
+        attempts = options["threads"] * options["attempts"]
+        self.stdout.write(
+            f"  {attempts} takes of {options['quantity']} from "
+            f"{options['stock']} units by {options['threads']} threads "
+            f"in {elapsed:.2f}s ({attempts / elapsed:.0f} takes/s)\n"
+            f"  taken {results['sold']}, left {inventory.available}, "
+            f"rejected {results['rejected']}, "
+            f"conflicts {results['conflicts']}, errors {results['errors']}"
+        )
+        style = self.style.ERROR if oversold else self.style.SUCCESS
+        self.stdout.write(style(f"  oversold {oversold} units"))
+        return {"oversold": oversold, "errors": results["errors"]}
+
+    @staticmethod
+    def hammer(take, options) -> tuple:
+        """Run ``take`` from every worker at once; return counts and time."""
+        quantity = options["quantity"]
+        results = {"sold": 0, "rejected": 0, "conflicts": 0, "errors": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options["threads"])
+
+        def worker():
+            counts = dict.fromkeys(results, 0)
+            barrier.wait()
+            try:
+                for _ in range(options["attempts"]):
+                    try:
+                        take()
+                        counts["sold"] += quantity
+                    except InsufficientStock:
+                        counts["rejected"] += 1
+                    except StockConflict:
+                        counts["conflicts"] += 1
+                    except DatabaseError:
+                        counts["errors"] += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    for key, value in counts.items():
+                        results[key] += value
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options["threads"])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - start
@@ -3,7 +3,27 @@ import os
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from django.db.models import DecimalField, OneToOneField, Sum
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    OneToOneField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, GreaterThan
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent with ``item_ids`` whenever the denormalized stock of those items
+# changes, including after bulk ItemInventory writes that bypass model
+# signals.
+stock_changed = Signal()
 
 
 class Category(models.Model):
@@ -25,8 +45,112 @@ class ImageItem(models.Model):
         blank=True)
 
 
+PRICE_FIELDS = {"price", "sale", "sale_price"}
+# Units of an inventory row that are neither sold nor held in a basket.
+AVAILABLE = F("quantity") - F("reserved")
+
+
+def _price_operand(value, field):
+    if hasattr(value, "resolve_expression"):
+        return value
+    return Value(value, output_field=Item._meta.get_field(field))
+
+
+def effective_price_expression(**values):
+    """
+    SQL for the effective price: the sale price while the item is on sale
+    and has one, else the price. ``values`` for price, sale or sale_price
+    stand in for the current columns, so an UPDATE can write the inputs
+    and the result in one statement.
+    """
+    price, sale, sale_price = (
+        _price_operand(values[name], name) if name in values else F(name)
+        for name in ("price", "sale", "sale_price")
+    )
+    return Case(
+        When(Exact(sale, True), then=Coalesce(sale_price, price)),
+        default=price,
+        output_field=DecimalField(max_digits=9, decimal_places=2),
+    )
+
+
+def _per_item(queryset, aggregate):
+    """Correlated subquery of ``aggregate`` over an item's rows."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(item=OuterRef("pk"))
+            .order_by()
+            .values("item")
+            .annotate(total=aggregate)
+            .values("total")
+        ),
+        0,
+    )
+
+
+class ItemQuerySet(models.QuerySet):
+    def with_variant_summary(self):
+        """Annotate ``variant_count`` and ``available_variant_count``."""
+        return self.annotate(
+            variant_count=_per_item(ItemInventory.objects.all(), Count("id")),
+            available_variant_count=_per_item(
+                ItemInventory.objects.filter(quantity__gt=F("reserved")),
+                Count("id")
+            ),
+        )
+
+    def update(self, **kwargs):
+        # The stored effective price follows every write to its inputs.
+        if PRICE_FIELDS & set(kwargs) and "effective_price" not in kwargs:
+            kwargs["effective_price"] = effective_price_expression(**{
+                name: kwargs[name] for name in PRICE_FIELDS & set(kwargs)
+            })
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.effective_price = obj.get_effective_price()
+        update_fields = kwargs.get("update_fields")
+        if update_fields and PRICE_FIELDS & set(update_fields):
+            kwargs["update_fields"] = [*update_fields, "effective_price"]
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if PRICE_FIELDS & set(fields) and "effective_price" not in fields:
+            objs = list(objs)
+            for obj in objs:
+                obj.effective_price = obj.get_effective_price()
+            fields = [*fields, "effective_price"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def refresh_effective_price(self) -> int:
+        return self.update(effective_price=effective_price_expression())
+
+    def refresh_stock(self) -> int:
+        """
+        Recompute ``total_stock`` and ``in_stock``. Only the items whose
+        stock moved are written and sent with ``stock_changed``, so a
+        refresh that changes nothing rebuilds and invalidates nothing.
+        """
+        stock = _per_item(ItemInventory.objects.all(), Sum(AVAILABLE))
+        in_stock = GreaterThan(stock, 0)
+        item_ids = list(
+            self.exclude(total_stock=stock, in_stock=in_stock)
+            .values_list("id", flat=True)
+        )
+        if not item_ids:
+            return 0
+        rows = self.filter(id__in=item_ids).update(
+            total_stock=stock,
+            in_stock=in_stock
+        )
+        stock_changed.send(sender=Item, item_ids=item_ids)
+        return rows
+
+
 class Item(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     brand = models.CharField(max_length=100, blank=True, null=True)
     fabric = models.CharField(max_length=100, blank=True, null=True)
     price = DecimalField(max_digits=9, decimal_places=2)
@@ -43,15 +167,89 @@ class Item(models.Model):
     color = models.ManyToManyField("ItemColor", related_name="items")
     sale = models.BooleanField(default=False)
     date_added = models.DateField(auto_now_add=True)
+    total_stock = models.PositiveIntegerField(default=0, db_index=True)
+    in_stock = models.BooleanField(default=False, db_index=True)
+    # Denormalized get_effective_price(), kept in step by save() and the
+    # ItemQuerySet write methods so price filters and sorts use an index.
+    effective_price = DecimalField(
+        max_digits=9,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
+    objects = ItemQuerySet.as_manager()
+
+    class Meta:
+        # Keyset pages seek on (ordering column, id); each filter the item
+        # list offers gets its own leading column.
+        indexes = [
+            models.Index(
+                fields=["effective_price", "id"],
+                name="item_eff_price_id_idx"
+            ),
+            models.Index(
+                fields=["sale", "effective_price", "id"],
+                name="item_sale_eff_price_idx"
+            ),
+            models.Index(
+                fields=["in_stock", "effective_price", "id"],
+                name="item_stock_eff_price_idx"
+            ),
+            models.Index(
+                fields=["category", "effective_price", "id"],
+                name="item_category_eff_price_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
-    def total_stock(self):
-        return self.inventory.aggregate(total=Sum("quantity"))["total"] or 0
+    def save(self, *args, **kwargs):
+        self.effective_price = self.get_effective_price()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and PRICE_FIELDS & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "effective_price"}
+        super().save(*args, **kwargs)
+
+    def get_effective_price(self):
+        """The effective price computed from the current field values."""
+        if self.sale and self.sale_price is not None:
+            return self.sale_price
+        return self.price
+
+
+class ItemSearchDocument(models.Model):
+    """Full-text index row of an item, maintained by ``search``."""
+
+    item = models.OneToOneField(
+        Item,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name="search_document",
+        db_constraint=False,
+    )
+
+    class Meta:
+        managed = False
+        db_table = "store_service_item_search"
+
+
+class ItemDocument(models.Model):
+    """Pre-rendered item payloads in one language, see ``documents``."""
 
-    def is_in_stock(self):
-        return self.total_stock() > 0
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="documents"
+    )
+    language = models.CharField(max_length=10)
+    summary = models.JSONField()
+    detail = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["item", "language"]
 
 
 def item_upload_path(instance, filename) -> str:
@@ -60,19 +258,42 @@ def item_upload_path(instance, filename) -> str:
 
 
 class ItemSize(models.Model):
-    size = models.CharField(max_length=100)
+    size = models.CharField(max_length=100, db_index=True)
 
     def __str__(self):
         return self.size
 
 
 class ItemColor(models.Model):
-    color = models.CharField(max_length=100)
+    color = models.CharField(max_length=100, db_index=True)
 
     def __str__(self):
         return self.color
 
 
+class ItemInventoryQuerySet(models.QuerySet):
+    refresh_batch_size = 500
+
+    # bulk_update() writes through update(), so it refreshes items too.
+    def update(self, **kwargs):
+        item_ids = list(self.values_list("item_id", flat=True).distinct())
+        rows = super().update(**kwargs)
+        if rows:
+            self._refresh_items(item_ids)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._refresh_items(sorted({obj.item_id for obj in objs}))
+        return objs
+
+    def _refresh_items(self, item_ids) -> None:
+        for start in range(0, len(item_ids), self.refresh_batch_size):
+            Item.objects.filter(
+                id__in=item_ids[start:start + self.refresh_batch_size]
+            ).refresh_stock()
+
+
 class ItemInventory(models.Model):
     item = models.ForeignKey(
         Item,
@@ -86,9 +307,27 @@ class ItemInventory(models.Model):
         ItemColor, on_delete=models.CASCADE, related_name="inventory"
     )
     quantity = models.PositiveIntegerField(default=0)
+    # Units held by basket lines, see ``stock``.
+    reserved = models.PositiveIntegerField(default=0)
+
+    objects = ItemInventoryQuerySet.as_manager()
 
     class Meta:
         unique_together = ["item", "size", "color"]
+        indexes = [
+            models.Index(
+                fields=["size", "item"],
+                name="inventory_size_item_idx"
+            ),
+            models.Index(
+                fields=["color", "item"],
+                name="inventory_color_item_idx"
+            ),
+        ]
+
+    @property
+    def available(self) -> int:
+        return self.quantity - self.reserved
 
     def __str__(self):
         return (f"{self.item.name} -"
@@ -124,13 +363,20 @@ class BasketItem(models.Model):
     size = models.ForeignKey(ItemSize, on_delete=models.CASCADE)
     color = models.ForeignKey(ItemColor, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
-    images = models.ManyToManyField(
-        ImageItem,
-        related_name="basket_items",
-        blank=True)
+    # Set while the line holds its quantity in ItemInventory.reserved.
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ["basket", "item", "size", "color"]
+        indexes = [
+            # Only live holds are indexed, so the sweeper's scan stays
+            # small however many released lines pile up.
+            models.Index(
+                fields=["hold_expires_at"],
+                condition=models.Q(hold_expires_at__isnull=False),
+                name="basketitem_hold_expiry_idx"
+            ),
+        ]
 
 
 class DeliveryType(models.TextChoices):
@@ -217,3 +463,54 @@ class OrderItem(models.Model):
         blank=True,
     )
     quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["order", "id"],
+                name="orderitem_order_id_idx"
+            ),
+        ]
+
+
+class CheckoutStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    READY = "ready", "Ready"
+    FAILED = "failed", "Failed"
+
+
+class CheckoutOutbox(models.Model):
+    """
+    A Stripe checkout session still to be created for ``order``. Written
+    in the order's transaction and processed after it commits, so no
+    Stripe call is made while the order's rows are locked.
+    """
+
+    order = OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="checkout"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=CheckoutStatus.choices,
+        default=CheckoutStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a worker may next pick the entry up: after a retry delay, or
+    # after the lease of the worker that claimed it runs out.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="checkout_pending_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"checkout for order {self.order_id}: {self.status}"
@@ -0,0 +1,138 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on every ordering column.
+
+    The ordering is taken from the queryset (falling back to ``ordering``)
+    and always ends with the primary key, so the cursor holds the full
+    sort key of the boundary row and each page is a single index range
+    scan, no matter how deep the client pages.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    ordering = ("id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor["r"])
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._flip(name) for name in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(
+                self._seek_filter(ordering, cursor["p"])
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        if not self.page:
+            self.has_next = self.has_previous = False
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = [
+            name for name in queryset.query.order_by
+            if isinstance(name, str)
+        ] or list(self.ordering)
+        if not any(name.lstrip("-") in ("id", "pk") for name in ordering):
+            ordering.append("-id" if ordering[0].startswith("-") else "id")
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            {"p": self._position(self.page[-1]), "r": 0}
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(
+            {"p": self._position(self.page[0]), "r": 1}
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            if len(cursor["p"]) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._to_python(name.lstrip("-"), value)
+                for name, value in zip(self.ordering, cursor["p"])
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return {"p": position, "r": bool(cursor.get("r"))}
+
+    def encode_cursor(self, cursor):
+        encoded = urlsafe_b64encode(
+            json.dumps(cursor, separators=(",", ":")).encode("ascii")
+        ).decode("ascii")
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            encoded
+        )
+
+    def _position(self, obj):
+        position = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if not isinstance(value, (int, float, bool, type(None))):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def _to_python(self, name, value):
+        try:
+            field = self.model._meta.get_field("id" if name == "pk" else name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith("-") else f"-{name}"
+
+    @staticmethod
+    def _seek_filter(ordering, position):
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{field}__{lookup}": value})
+            equal[field] = value
+        return condition
@@ -0,0 +1,85 @@
+import orjson
+from django.db.models.fields.files import FieldFile
+from django.http import StreamingHttpResponse
+from django.utils import translation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+LINE_SEPARATORS = (
+    (b"\xe2\x80\xa8", b"\\u2028"),
+    (b"\xe2\x80\xa9", b"\\u2029"),
+)
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return _encoder.default(obj)
+
+
+def dumps(data) -> bytes:
+    """
+    Encode ``data`` with orjson, producing the same bytes as DRF's
+    compact JSONRenderer. Types orjson does not know (Decimal, dates
+    and times, lazy strings, files) go through DRF's encoder.
+    """
+    content = orjson.dumps(data, default=_default, option=OPTIONS)
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in content:
+            content = content.replace(separator, escaped)
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Compact JSON renderer backed by orjson. Indented output, as asked
+    for by the browsable API, is left to DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(
+                data,
+                accepted_media_type,
+                renderer_context
+            )
+        return dumps(data)
+
+    @staticmethod
+    def iter_render(chunks):
+        """
+        Render an iterable of lists as a single JSON array, one chunk at a
+        time, so only one chunk is held in memory.
+        """
+        yield b"["
+        separator = b""
+        for chunk in chunks:
+            if chunk:
+                yield separator + dumps(chunk)[1:-1]
+                separator = b","
+        yield b"]"
+
+
+def stream_json(chunks, filename=None) -> StreamingHttpResponse:
+    """
+    Stream ``chunks`` (an iterable of lists of payloads) as a JSON
+    array, evaluated lazily in the language active now.
+    """
+
+    def content(language):
+        with translation.override(language):
+            yield from FastJSONRenderer.iter_render(chunks)
+
+    response = StreamingHttpResponse(
+        content(translation.get_language()),
+        content_type=FastJSONRenderer.media_type,
+    )
+    if filename:
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,236 @@
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from modeltranslation.utils import build_localized_fieldname
+
+from .models import Item, ItemDescription, ItemSearchDocument
+
+SEARCH_TABLE = ItemSearchDocument._meta.db_table
+
+
+def _localized(field: str) -> list:
+    return [
+        build_localized_fieldname(field, code)
+        for code, _ in settings.LANGUAGES
+    ]
+
+
+def _tokens(query: str) -> list:
+    return re.findall(r"\w+", query or "")
+
+
+class SQLiteSearchBackend:
+    """FTS5 table keyed by item id, ranked with bm25."""
+
+    weights = "0.0, 10.0, 5.0, 2.0, 1.0"
+
+    def install(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "item_id UNINDEXED, name, brand, fabric, description, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def remove(self, cursor, item_ids) -> None:
+        placeholders = ", ".join(["%s"] * len(item_ids))
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+            list(item_ids),
+        )
+
+    def write(self, cursor, documents) -> None:
+        self.remove(cursor, [document[0] for document in documents])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, item_id, name, brand, fabric, description) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [(document[0], *document) for document in documents],
+        )
+
+    def search(self, queryset, tokens):
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return queryset.filter(search_document__isnull=False).filter(
+            RawSQL(
+                f"{SEARCH_TABLE} MATCH %s",
+                (match,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"-bm25({SEARCH_TABLE}, {self.weights})",
+                (),
+                output_field=FloatField(),
+            )
+        )
+
+
+def trigram_indexes() -> dict:
+    """
+    Name -> column of the pg_trgm indexes behind the substring filters:
+    ``brand`` in the item list and the admin's ``name``/``brand`` search.
+    Both use icontains, i.e. ``UPPER(column::text) LIKE``, so that is
+    the indexed expression.
+    """
+    table = Item._meta.db_table
+    return {
+        f"{table}_{column}_trgm": column
+        for column in ["brand", *_localized("name")]
+    }
+
+
+class PostgresSearchBackend:
+    """tsvector side table with a GIN index, ranked with ts_rank."""
+
+    def install(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "item_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin "
+            f"ON {SEARCH_TABLE} USING gin (document)"
+        )
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in trigram_indexes().items():
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f"ON {Item._meta.db_table} "
+                f"USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+            )
+
+    def remove(self, cursor, item_ids) -> None:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE item_id = ANY(%s)",
+            [list(item_ids)],
+        )
+
+    def write(self, cursor, documents) -> None:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (item_id, document) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C') || "
+            "setweight(to_tsvector('simple', %s), 'D')) "
+            "ON CONFLICT (item_id) DO UPDATE SET document = EXCLUDED.document",
+            documents,
+        )
+
+    def search(self, queryset, tokens):
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        return queryset.filter(search_document__isnull=False).filter(
+            RawSQL(
+                f"{SEARCH_TABLE}.document @@ to_tsquery('simple', %s)",
+                (tsquery,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({SEARCH_TABLE}.document, "
+                "to_tsquery('simple', %s))",
+                (tsquery,),
+                output_field=FloatField(),
+            )
+        )
+
+
+class FallbackSearchBackend:
+    """Unindexed substring matching for databases without a text index."""
+
+    def install(self, cursor) -> None:
+        pass
+
+    def remove(self, cursor, item_ids) -> None:
+        pass
+
+    def write(self, cursor, documents) -> None:
+        pass
+
+    def search(self, queryset, tokens):
+        fields = [
+            "brand",
+            *_localized("name"),
+            *_localized("fabric"),
+            *[f"description__{name}" for name in _localized("description")],
+        ]
+        for token in tokens:
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f"{field}__icontains": token})
+            queryset = queryset.filter(condition)
+        return queryset.distinct().annotate(search_rank=Value(0.0))
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend(using=None):
+    vendor = connections[using].vendor if using else connection.vendor
+    return BACKENDS.get(vendor, FallbackSearchBackend)()
+
+
+def install_search_index(using=None) -> None:
+    with connections[using or "default"].cursor() as cursor:
+        get_backend(using).install(cursor)
+
+
+def build_documents(item_ids) -> list:
+    descriptions = {}
+    rows = ItemDescription.objects.filter(item_id__in=item_ids).values_list(
+        "item_id", *_localized("title"), *_localized("description")
+    )
+    for item_id, *texts in rows:
+        descriptions.setdefault(item_id, []).extend(texts)
+
+    documents = []
+    rows = Item.objects.filter(id__in=item_ids).values_list(
+        "id", "brand", *_localized("name"), *_localized("fabric")
+    )
+    for item_id, brand, *texts in rows:
+        names, fabrics = texts[:len(texts) // 2], texts[len(texts) // 2:]
+        documents.append((
+            item_id,
+            " ".join(filter(None, names)),
+            brand or "",
+            " ".join(filter(None, fabrics)),
+            " ".join(filter(None, descriptions.get(item_id, []))),
+        ))
+    return documents
+
+
+def index_items(item_ids) -> None:
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    documents = build_documents(item_ids)
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        if documents:
+            backend.write(cursor, documents)
+        indexed = {document[0] for document in documents}
+        missing = [item_id for item_id in item_ids if item_id not in indexed]
+        if missing:
+            backend.remove(cursor, missing)
+
+
+def remove_items(item_ids) -> None:
+    item_ids = list(item_ids)
+    if item_ids:
+        with connection.cursor() as cursor:
+            get_backend().remove(cursor, item_ids)
+
+
+def search_items(queryset, query: str):
+    """
+    Filter ``queryset`` to items matching every word of ``query`` and
+    annotate them with ``search_rank`` (higher is more relevant).
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return queryset.annotate(search_rank=Value(0.0)).none()
+    return get_backend().search(queryset, tokens)
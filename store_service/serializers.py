@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from user_service.serializers import UserSerializer
@@ -6,6 +7,7 @@ from .models import (
     Basket,
     BasketItem,
     Category,
+    CheckoutOutbox,
     DeliveryInfo,
     DeliveryType,
     ImageItem,
@@ -46,9 +48,75 @@ class ImageItemSerializer(serializers.ModelSerializer):
         fields = ["image"]
 
 
-class ItemSerializer(serializers.ModelSerializer):
+def _split_param(value) -> list:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for a top-level serializer.
+
+    ``?fields=a,b`` keeps only the listed fields, and ``?expand=c`` adds
+    fields named in ``Meta.expandable_fields``, which are left out by
+    default. Both can also be passed as keyword arguments. Subclasses
+    map field names to the related lookups behind them, so unrequested
+    fields skip their joins and prefetches too.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = self.get_requested_fields(
+            self.context.get("request"),
+            fields,
+            expand
+        )
+        for name in list(self.fields):
+            if name not in names:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(
+            cls,
+            request=None,
+            fields=None,
+            expand=None
+    ) -> list:
+        params = getattr(request, "query_params", {})
+        fields = set(fields or _split_param(params.get("fields")))
+        expand = set(expand or _split_param(params.get("expand")))
+        expandable = getattr(cls.Meta, "expandable_fields", ())
+        if fields:
+            return [
+                name for name in cls.Meta.fields
+                if name in fields or name in expand
+            ]
+        return [
+            name for name in cls.Meta.fields
+            if name not in expandable or name in expand
+        ]
+
+    @classmethod
+    def get_select_related(cls, field_names) -> list:
+        return []
+
+    @classmethod
+    def get_prefetch_lookups(cls, field_names=None) -> list:
+        return []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, field_names=None):
+        if field_names is None:
+            field_names = cls.get_requested_fields()
+        return queryset.select_related(
+            *cls.get_select_related(field_names)
+        ).prefetch_related(
+            *cls.get_prefetch_lookups(field_names)
+        )
+
+
+class ItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
-    in_stock = serializers.SerializerMethodField()
     description = ItemDescriptionSerializer(many=True, read_only=True)
     additional_info = serializers.SerializerMethodField()
 
@@ -60,31 +128,60 @@ class ItemSerializer(serializers.ModelSerializer):
             "brand",
             "date_added",
             "fabric",
+            "image",
             "images",
             "name",
             "description",
             "price",
+            "effective_price",
             "category",
             "sale",
             "in_stock",
             "additional_info",
         ]
+        read_only_fields = ["in_stock"]
+        expandable_fields = ["image"]
+
+    @classmethod
+    def get_prefetch_lookups(cls, field_names=None):
+        if field_names is None:
+            field_names = cls.get_requested_fields()
+        lookups = []
+        if {"image", "images"} & set(field_names):
+            lookups.append(Prefetch(
+                "images",
+                queryset=ImageItem.objects.order_by("id")
+            ))
+        if "description" in field_names:
+            lookups.append(Prefetch(
+                "description",
+                queryset=ItemDescription.objects.order_by("id")
+            ))
+        if "additional_info" in field_names:
+            lookups.append(Prefetch(
+                "inventory",
+                queryset=ItemInventory.objects.select_related(
+                    "size",
+                    "color"
+                ).order_by("id")
+            ))
+        return lookups
+
+    def get_image(self, obj):
+        images = obj.images.all()
+        return images[0].image.url if images else None
 
     def get_images(self, obj):
         return [image.image.url for image in obj.images.all()]
 
-    def get_in_stock(self, obj):
-        return ItemInventory.objects.filter(item=obj, quantity__gt=0).exists()
-
     def get_additional_info(self, obj):
-        inventory = ItemInventory.objects.filter(item=obj)
         additional_info_list = []
-        for inv in inventory:
+        for inv in obj.inventory.all():
             additional_info_list.append(
                 {
                     "size": inv.size.size,
                     "color": inv.color.color,
-                    "amount": inv.quantity,
+                    "amount": inv.available,
                 }
             )
 
@@ -96,14 +193,27 @@ class ItemDetailSerializer(ItemSerializer):
         model = Item
         fields = [
             "id",
+            "image",
             "images",
             "name",
             "description",
             "price",
+            "effective_price",
             "category",
             "date_added",
             "additional_info",
         ]
+        expandable_fields = ["image"]
+
+
+class ItemBatchSerializer(serializers.Serializer):
+    max_ids = 100
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=max_ids,
+    )
 
 
 class BasketItemSerializer(serializers.ModelSerializer):
@@ -122,7 +232,8 @@ class BasketItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = BasketItem
-        fields = ["id", "item", "size", "color", "quantity"]
+        fields = ["id", "item", "size", "color", "quantity", "hold_expires_at"]
+        read_only_fields = ["hold_expires_at"]
 
     def validate(self, data):
         item = data.get("item",
@@ -147,12 +258,39 @@ class BasketItemSerializer(serializers.ModelSerializer):
                 "does not exist in inventory."
             )
 
-        if inventory.quantity < quantity:
+        available = inventory.available
+        if self.instance is not None and (
+                self.instance.hold_expires_at is not None
+                and self.instance.item_id == inventory.item_id
+                and self.instance.size_id == inventory.size_id
+                and self.instance.color_id == inventory.color_id
+        ):
+            # The line's own hold is free to be moved to its new quantity.
+            available += self.instance.quantity
+        if available < quantity:
             raise serializers.ValidationError("Not enough items in stock")
 
         return data
 
 
+class BasketLineSerializer(serializers.Serializer):
+    item = serializers.CharField()
+    size = serializers.CharField()
+    color = serializers.CharField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BasketBulkSerializer(serializers.Serializer):
+    max_lines = 100
+
+    lines = serializers.ListField(
+        child=BasketLineSerializer(),
+        allow_empty=True,
+        max_length=max_lines,
+    )
+    replace = serializers.BooleanField(default=False)
+
+
 class BasketItemForBasketSerializer(serializers.ModelSerializer):
     item = serializers.SlugRelatedField(slug_field="name", read_only=True)
     size = serializers.SlugRelatedField(
@@ -169,10 +307,19 @@ class BasketItemForBasketSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = BasketItem
-        fields = ["id", "item", "size", "color", "price", "quantity", "images"]
+        fields = [
+            "id",
+            "item",
+            "size",
+            "color",
+            "price",
+            "quantity",
+            "hold_expires_at",
+            "images",
+        ]
 
 
-class BasketSerializer(serializers.ModelSerializer):
+class BasketSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     basket_items = BasketItemForBasketSerializer(many=True, read_only=True)
 
@@ -180,6 +327,45 @@ class BasketSerializer(serializers.ModelSerializer):
         model = Basket
         fields = ["id", "user", "basket_items"]
 
+    @classmethod
+    def get_select_related(cls, field_names):
+        return ["user"] if "user" in field_names else []
+
+    @classmethod
+    def get_prefetch_lookups(cls, field_names=None):
+        if field_names is None:
+            field_names = cls.get_requested_fields()
+        if "basket_items" not in field_names:
+            return []
+        return [Prefetch(
+            "basket_items",
+            queryset=BasketItem.objects.select_related(
+                "item",
+                "size",
+                "color"
+            ).prefetch_related(Prefetch(
+                "item__images",
+                queryset=ImageItem.objects.order_by("id")
+            ))
+        )]
+
+
+class BasketLineAvailabilitySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    item = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    available = serializers.IntegerField()
+    in_stock = serializers.BooleanField()
+
+
+class BasketSummarySerializer(serializers.Serializer):
+    lines = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    savings = serializers.DecimalField(max_digits=12, decimal_places=2)
+    in_stock = serializers.BooleanField()
+    availability = BasketLineAvailabilitySerializer(many=True)
+
 
 class BasketListSerializer(BasketSerializer):
     items = ItemDetailSerializer(many=True, read_only=True)
@@ -195,12 +381,20 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class CategoryDetailSerializer(CategorySerializer):
-    items = ItemDetailSerializer(many=True, read_only=True)
+    """
+    Category with one page of its items. The view passes the page,
+    already rendered, as ``items`` in the serializer context.
+    """
+
+    items = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = ["id", "name", "description", "items"]
 
+    def get_items(self, obj):
+        return self.context.get("items")
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     item = serializers.SlugRelatedField(slug_field="name", read_only=True)
@@ -212,6 +406,17 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ["item", "price", "size", "color", "quantity"]
 
 
+class CheckoutStatusSerializer(serializers.ModelSerializer):
+    checkout_url = serializers.CharField(
+        source="order.checkout_url",
+        read_only=True
+    )
+
+    class Meta:
+        model = CheckoutOutbox
+        fields = ["order", "status", "checkout_url", "attempts"]
+
+
 class PostDepartmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = PostDepartment
@@ -230,7 +435,8 @@ class DeliveryInfoDetailSerializer(DeliveryInfoSerializer):
         fields = ("full_name", "number", "email", "comments", "delivery_type")
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
     payment_type = serializers.ChoiceField(choices=PaymentType.choices)
     delivery_info = DeliveryInfoDetailSerializer(many=False, read_only=False)
@@ -240,8 +446,32 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             "id",
+            "user",
             "items",
             "payment_type",
             "delivery_info",
             "post_department",
         ]
+        expandable_fields = ["user"]
+
+    @classmethod
+    def get_select_related(cls, field_names):
+        return [
+            name for name in ("user", "delivery_info", "post_department")
+            if name in field_names
+        ]
+
+    @classmethod
+    def get_prefetch_lookups(cls, field_names=None):
+        if field_names is None:
+            field_names = cls.get_requested_fields()
+        if "items" not in field_names:
+            return []
+        return [Prefetch(
+            "items",
+            queryset=OrderItem.objects.select_related(
+                "item",
+                "size",
+                "color"
+            ).order_by("id")
+        )]
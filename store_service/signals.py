@@ -0,0 +1,119 @@
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.db import transaction
+from django.dispatch import receiver
+
+from .cache import VERSIONED_MODELS, bump_version
+from .documents import schedule_rebuild
+from .models import (
+    BasketItem,
+    ImageItem,
+    Item,
+    ItemColor,
+    ItemDescription,
+    ItemInventory,
+    ItemSize,
+    stock_changed,
+)
+from .search import index_items, install_search_index, remove_items
+from .stock import release_holds
+
+
+@receiver(post_migrate)
+def install_store_indexes(sender, using, **kwargs) -> None:
+    if sender.name == "store_service":
+        install_search_index(using)
+
+
+@receiver(post_save, sender=ItemInventory)
+@receiver(post_delete, sender=ItemInventory)
+def refresh_item_stock(sender, instance, **kwargs) -> None:
+    Item.objects.filter(id=instance.item_id).refresh_stock()
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, **kwargs) -> None:
+    index_items([instance.id])
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_from_index(sender, instance, **kwargs) -> None:
+    remove_items([instance.id])
+
+
+@receiver(post_save, sender=ItemDescription)
+@receiver(post_delete, sender=ItemDescription)
+def index_item_description(sender, instance, **kwargs) -> None:
+    index_items([instance.item_id])
+
+
+@receiver(post_save, sender=Item)
+def rebuild_item_document(sender, instance, **kwargs) -> None:
+    schedule_rebuild([instance.id])
+
+
+@receiver(post_save, sender=ImageItem)
+@receiver(post_delete, sender=ImageItem)
+@receiver(post_save, sender=ItemDescription)
+@receiver(post_delete, sender=ItemDescription)
+def rebuild_parent_item_document(sender, instance, **kwargs) -> None:
+    schedule_rebuild([instance.item_id])
+
+
+@receiver(post_save, sender=ItemSize)
+@receiver(post_save, sender=ItemColor)
+def rebuild_variant_item_documents(
+        sender,
+        instance,
+        update_fields=None,
+        **kwargs
+) -> None:
+    lookup = "size" if sender is ItemSize else "color"
+    # Documents show only the name, in every language.
+    if update_fields is not None and not any(
+            name == lookup or name.startswith(f"{lookup}_")
+            for name in update_fields
+    ):
+        return
+    schedule_rebuild(
+        ItemInventory.objects.filter(
+            **{lookup: instance}
+        ).values_list("item_id", flat=True).distinct(),
+        models=[sender],
+    )
+
+
+@receiver(stock_changed)
+def rebuild_stock_item_documents(sender, item_ids, **kwargs) -> None:
+    # Every basket add, hold and checkout moves stock: keep the re-render
+    # off the request when Celery can take it.
+    schedule_rebuild(item_ids, models=[ItemInventory], defer=True)
+
+
+@receiver(pre_delete, sender=BasketItem)
+def release_basket_item_hold(sender, instance, **kwargs) -> None:
+    if instance.hold_expires_at is not None:
+        release_holds(BasketItem.objects.filter(id=instance.id))
+
+
+# Version bumps wait for the commit, and are connected after every
+# receiver that schedules a document rebuild, so their on_commit
+# callbacks run last: a new version (cache key, ETag) only appears once
+# the documents it should serve have been rebuilt.
+def bump_catalog_version(sender, **kwargs) -> None:
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_catalog_version, sender=model)
+    post_delete.connect(bump_catalog_version, sender=model)
+
+
+# Only payloads that carry stock list ItemInventory among their models.
+@receiver(stock_changed)
+def bump_stock_version(sender, **kwargs) -> None:
+    transaction.on_commit(lambda: bump_version(ItemInventory))
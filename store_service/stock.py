@@ -0,0 +1,201 @@
+"""
+Stock movements on ItemInventory.
+
+``quantity`` is the stock on hand and ``reserved`` the part of it held by
+basket lines, so ``quantity - reserved`` is what can still be sold. Each
+movement is one conditional UPDATE (``... WHERE quantity - reserved >=
+n``), so concurrent writers never read a quantity and write back a stale
+one: whoever finds too little stock matches no row and gets
+InsufficientStock. Checkout moves all the rows of a basket with one
+such UPDATE (``take_stock_for_lines``).
+
+A basket line holds its quantity until ``hold_expires_at``; after that
+``release_expired_holds`` gives the units back in batches.
+
+``atomic_with_retry`` runs a whole stock transaction again when the
+database refuses its locks (SQLite's "database is locked", a PostgreSQL
+deadlock), and raises StockConflict once it has tried enough.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    When,
+)
+from django.utils import timezone
+
+from .models import BasketItem, ItemInventory
+
+
+class InsufficientStock(Exception):
+    def __init__(self, requested: int, variant=None):
+        self.requested = requested
+        self.variant = variant
+        if variant is None:
+            message = "Not enough items in stock"
+        else:
+            message = f"Not enough items in stock for {variant}"
+        super().__init__(message)
+
+
+class StockConflict(Exception):
+    def __init__(self):
+        super().__init__("The store is busy, please try again")
+
+
+CONFLICT_RETRIES = 3
+CONFLICT_BACKOFF = 0.05
+
+
+def atomic_with_retry(func, *args, **kwargs):
+    """
+    Call ``func`` in its own transaction and return its result. When the
+    database gives up on a lock the transaction is rolled back and run
+    again, up to CONFLICT_RETRIES times with a growing pause, then
+    StockConflict is raised. Inside an outer transaction nothing can be
+    retried, so the first failure raises StockConflict.
+    """
+    for attempt in range(CONFLICT_RETRIES + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if (attempt == CONFLICT_RETRIES
+                    or transaction.get_connection().in_atomic_block):
+                raise StockConflict() from e
+        time.sleep(CONFLICT_BACKOFF * 2 ** attempt)
+
+
+def _available(quantity: int, **lookup):
+    return ItemInventory.objects.filter(
+        quantity__gte=F("reserved") + quantity,
+        **lookup
+    )
+
+
+def hold_stock(quantity: int, variant=None, **lookup) -> None:
+    """
+    Reserve ``quantity`` available units of the inventory row matching
+    ``lookup`` (``id=...`` or ``item=..., size=..., color=...``), or
+    raise InsufficientStock naming ``variant``.
+    """
+    held = _available(quantity, **lookup).update(
+        reserved=F("reserved") + quantity
+    )
+    if not held:
+        raise InsufficientStock(quantity, variant)
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(minutes=settings.BASKET_HOLD_MINUTES)
+
+
+def take_stock_for_lines(lines) -> None:
+    """
+    Sell the quantity of every basket line, all or nothing: held units
+    come out of the reservation, lines without a hold take from what is
+    available. Call it inside a transaction, which a shortfall must roll
+    back.
+
+    The statement count does not grow with the basket. One SELECT ...
+    FOR UPDATE locks the lines' inventory rows in id order, so
+    concurrent checkouts cannot deadlock, and names the first item that
+    falls short. One UPDATE then takes the units of every row on the
+    condition that each still has them, so stock cannot be oversold
+    even where the lock does nothing (SQLite). One more UPDATE clears
+    the holds.
+    """
+    lines = {
+        (line.item_id, line.size_id, line.color_id): line for line in lines
+    }
+    if not lines:
+        return
+    ids = [line.id for line in lines.values()]
+    rows = list(
+        ItemInventory.objects.select_for_update().filter(Exists(
+            BasketItem.objects.filter(
+                id__in=ids,
+                item=OuterRef("item"),
+                size=OuterRef("size"),
+                color=OuterRef("color"),
+            )
+        )).order_by("id")
+    )
+    found = {(row.item_id, row.size_id, row.color_id) for row in rows}
+    for key, line in lines.items():
+        if key not in found:
+            raise InsufficientStock(line.quantity, line.item)
+
+    guard, quantities, reservations = Q(pk__in=[]), [], []
+    for row in rows:
+        line = lines[(row.item_id, row.size_id, row.color_id)]
+        held = line.quantity if line.hold_expires_at is not None else 0
+        if row.available + held < line.quantity:
+            raise InsufficientStock(line.quantity, line.item)
+        unheld = line.quantity - held
+        guard |= Q(id=row.id, quantity__gte=F("reserved") + unheld)
+        quantities.append(When(id=row.id, then=F("quantity") - line.quantity))
+        reservations.append(When(id=row.id, then=F("reserved") - held))
+    taken = ItemInventory.objects.filter(guard).update(
+        quantity=Case(*quantities),
+        reserved=Case(*reservations),
+    )
+    if taken != len(rows):
+        raise InsufficientStock(sum(line.quantity for line in lines.values()))
+    BasketItem.objects.filter(
+        id__in=ids,
+        hold_expires_at__isnull=False
+    ).update(hold_expires_at=None)
+
+
+def release_holds(lines) -> int:
+    """
+    Give back the units held by ``lines`` (a BasketItem queryset) and
+    clear their holds, with one UPDATE per table.
+    """
+    lines = lines.filter(hold_expires_at__isnull=False)
+    same_variant = lines.filter(
+        item=OuterRef("item"),
+        size=OuterRef("size"),
+        color=OuterRef("color"),
+    ).order_by()
+    ItemInventory.objects.filter(Exists(same_variant)).update(
+        reserved=F("reserved") - Subquery(
+            same_variant.values("item", "size", "color")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+    )
+    return lines.update(hold_expires_at=None)
+
+
+def release_expired_holds(now=None, batch_size: int = 1000) -> int:
+    """
+    Release every hold that expired before ``now``, ``batch_size`` lines
+    per transaction, and return the number of lines released. Lines
+    locked by a checkout in progress are left for the next run.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                BasketItem.objects.select_for_update(skip_locked=True)
+                .filter(hold_expires_at__lt=now)
+                .order_by("hold_expires_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                return released
+            released += release_holds(
+                BasketItem.objects.filter(id__in=batch)
+            )
@@ -1,3 +1,779 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils import translation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import cache as response_cache
+from . import documents, stock, utils
+from .baskets import BASKET_TOKEN_HEADER
+from .checkout import LEASE, _claim, enqueue_checkout, process_checkout
+from .fastpath import (
+    ITEM_COLUMNS,
+    ORDER_COLUMNS,
+    serialize_items,
+    serialize_orders,
+)
+
+from .management.commands.fake_stripe import FakeStripeServer
+from .models import (
+    BasketItem,
+    Category,
+    CheckoutStatus,
+    DeliveryInfo,
+    ImageItem,
+    Item,
+    ItemColor,
+    ItemDescription,
+    ItemDocument,
+    ItemInventory,
+    ItemSize,
+    Order,
+    OrderItem,
+    PostDepartment,
+    stock_changed,
+)
+from .serializers import ItemDetailSerializer, ItemSerializer, OrderSerializer
+
+PASSWORD = "Passw0rd!!x"
+
+# A cache every process sees, as Redis is in production; version-keyed
+# caching is off with the per-process locmem default.
+shared_cache = override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": Path(tempfile.gettempdir()) / "store_service-tests",
+    }
+})
+
+
+def make_catalog(count: int = 3, category=None) -> list:
+    """
+    ``count`` items with a description, an image and four variants of
+    three units each (sizes S and M, colours red and blue). Every third
+    item is on sale.
+    """
+    category = category or Category.objects.create(
+        name="Shirts",
+        description="Cotton shirts"
+    )
+    sizes = [ItemSize.objects.get_or_create(size=size)[0] for size in "SM"]
+    colors = [
+        ItemColor.objects.get_or_create(color=color)[0]
+        for color in ("red", "blue")
+    ]
+    items = []
+    for index in range(count):
+        on_sale = index % 3 == 0
+        item = Item.objects.create(
+            name=f"Shirt {index}",
+            brand="Acme",
+            fabric="cotton",
+            price=Decimal("10.00") + index,
+            sale=on_sale,
+            sale_price=Decimal("5.00") + index if on_sale else None,
+            category=category,
+        )
+        item.size.set(sizes)
+        item.color.set(colors)
+        ItemDescription.objects.create(
+            item=item,
+            title="Fabric",
+            description="Soft cotton"
+        )
+        ImageItem.objects.create(item=item, image=f"items/{index}.png")
+        ItemInventory.objects.bulk_create(
+            ItemInventory(item=item, size=size, color=color, quantity=3)
+            for size in sizes
+            for color in colors
+        )
+        items.append(item)
+    return items
+
+
+def make_user(email: str = "buyer@example.com"):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=PASSWORD
+    )
+
+
+class StoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # Requests under /uk/ leave uk active in the test thread, which
+        # would send later writes to the _uk columns.
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def make_catalog(self, count: int = 3) -> list:
+        # Run the on-commit document rebuilds, as a real commit would.
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_catalog(count)
+
+    def login(self, user=None):
+        user = user or make_user()
+        self.client.force_authenticate(user)
+        return user
+
+
+def make_orders(user, items) -> list:
+    """One order per item in ``items``, with one line each."""
+    department = PostDepartment.objects.create(
+        city="Kyiv",
+        state="Kyiv",
+        address="Main St 1"
+    )
+    orders = []
+    for item in items:
+        order = Order.objects.create(
+            user=user,
+            payment_type="card",
+            post_department=department
+        )
+        inventory = item.inventory.first()
+        OrderItem.objects.create(
+            order=order,
+            item=item,
+            price=item.effective_price,
+            size=inventory.size,
+            color=inventory.color,
+            quantity=1,
+        )
+        orders.append(order)
+    return orders
+
+
+class QueryBudgetTests(StoreTestCase):
+    """
+    Reads cost a fixed number of queries whatever the page size. Pages
+    of 2 and 12 rows must both stay within the budget.
+    """
+
+    def assert_budget(self, queries: int, url: str) -> None:
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_item_list_and_retrieve(self):
+        for count in (2, 12):
+            items = self.make_catalog(count)
+            with self.subTest(count=count):
+                # Item page and the stored documents of its items.
+                self.assert_budget(2, "/en/api/v1/store/items/")
+                self.assert_budget(
+                    2,
+                    f"/en/api/v1/store/items/{items[0].id}/"
+                )
+
+    def test_item_list_without_documents(self):
+        for count in (2, 12):
+            self.make_catalog(count)
+            ItemDocument.objects.all().delete()
+            with self.subTest(count=count):
+                # Page, missing documents, then one query per relation.
+                self.assert_budget(5, "/en/api/v1/store/items/")
+
+    def test_category_retrieve(self):
+        for count in (2, 12):
+            category = self.make_catalog(count)[0].category
+            with self.subTest(count=count):
+                self.assert_budget(
+                    4,
+                    f"/en/api/v1/store/categories/{category.id}/"
+                )
+
+    def test_order_list(self):
+        user = self.login()
+        for count in (2, 12):
+            make_orders(user, self.make_catalog(count))
+            with self.subTest(count=count):
+                # Order page and the prefetched lines with their items.
+                self.assert_budget(2, "/en/api/v1/store/orders/")
+
+
+class BasketQueryBudgetTests(StoreTestCase):
+    def add(self, queries: int, item) -> None:
+        # The view's atomic block is a savepoint under TestCase, which
+        # adds two statements to the budget in its docstring.
+        with self.assertNumQueries(queries + 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/en/api/v1/store/basket-items/",
+                    {"item": item.name, "size": "S", "color": "red"},
+                    format="json",
+                )
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_to_basket(self):
+        first, second = self.make_catalog(2)
+        self.login()
+        self.add(18, first)
+        self.add(13, first)
+        self.add(15, second)
+
+
+class CheckoutTests(StoreTestCase):
+    order = {
+        "payment_type": "other",
+        "delivery_info": {
+            "full_name": "Buyer",
+            "number": "1",
+            "email": "buyer@example.com",
+            "comments": "",
+            "delivery_type": "pickup",
+        },
+        "post_department": {
+            "city": "Kyiv",
+            "state": "Kyiv",
+            "address": "Main St 1",
+        },
+    }
+
+    def fill_basket(self, lines) -> None:
+        response = self.client.post(
+            "/en/api/v1/store/basket-items/bulk/",
+            {"lines": lines},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def check_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/en/api/v1/store/orders/",
+                self.order,
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response
+
+    def test_statements_do_not_grow_with_lines(self):
+        """
+        Checkout reads the basket lines, takes their stock and writes the
+        order lines with set-based statements (``create_order_items``).
+        A 1-line and a 20-line basket must cost the same, so a per-line
+        query slipping back in fails here whatever the exact count.
+        """
+        items = self.make_catalog(5)
+        variants = [
+            {"item": item.name, "size": size, "color": color, "quantity": 1}
+            for item in items
+            for size in "SM"
+            for color in ("red", "blue")
+        ]
+        counts = []
+        for lines in (variants[:1], variants):
+            self.login(make_user(f"buyer{len(lines)}@example.com"))
+            self.fill_basket(lines)
+            with CaptureQueriesContext(connection) as queries:
+                self.check_out()
+            self.assertEqual(
+                OrderItem.objects.filter(
+                    order__user__email=f"buyer{len(lines)}@example.com"
+                ).count(),
+                len(lines)
+            )
+            counts.append(len(queries))
+        self.assertEqual(len(variants), 20)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_sale_items_are_charged_their_sale_price(self):
+        on_sale, full_price = self.make_catalog(2)
+        self.login()
+        self.fill_basket([
+            {"item": item.name, "size": "S", "color": "red", "quantity": 2}
+            for item in (on_sale, full_price)
+        ])
+        subtotal = Decimal(
+            self.client.get("/en/api/v1/store/basket/summary/")
+            .json()["subtotal"]
+        )
+        self.check_out()
+
+        lines = {line.item_id: line for line in OrderItem.objects.all()}
+        self.assertEqual(lines[on_sale.id].price, on_sale.sale_price)
+        self.assertEqual(lines[full_price.id].price, full_price.price)
+        self.assertEqual(
+            sum(line.price * line.quantity for line in lines.values()),
+            subtotal
+        )
+
+    def test_lock_conflict_answers_409(self):
+        item = self.make_catalog(1)[0]
+        self.login()
+        self.fill_basket([
+            {"item": item.name, "size": "S", "color": "red", "quantity": 1}
+        ])
+        with mock.patch(
+                "store_service.views.take_stock_for_lines",
+                side_effect=OperationalError("database is locked")
+        ):
+            response = self.client.post(
+                "/en/api/v1/store/orders/",
+                self.order,
+                format="json",
+            )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def start_stripe(self, fail: int = 0) -> FakeStripeServer:
+        server = FakeStripeServer(fail=fail)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        api_base = self.settings(STRIPE_API_BASE=server.base_url)
+        api_base.enable()
+        self.addCleanup(api_base.disable)
+        return server
+
+    def make_checkout(self):
+        user = self.login()
+        [order] = make_orders(user, self.make_catalog(1))
+        return enqueue_checkout(order)
+
+    def test_outbox_creates_one_session(self):
+        server = self.start_stripe()
+        entry = self.make_checkout()
+
+        for _ in range(2):
+            entry = process_checkout(entry.id)
+            self.assertEqual(entry.status, CheckoutStatus.READY)
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(
+            list(server.sessions),
+            [f"checkout-order-{entry.order_id}"]
+        )
+        session = server.sessions[f"checkout-order-{entry.order_id}"]
+        self.assertEqual(entry.order.checkout_url, session["url"])
+        self.assertEqual(entry.attempts, 1)
+
+    def test_claim_holds_a_lease(self):
+        entry = self.make_checkout()
+        now = timezone.now()
+
+        self.assertTrue(_claim(entry.id, now))
+        # A second worker finds the entry leased.
+        self.assertFalse(_claim(entry.id, now))
+        self.assertFalse(_claim(entry.id, now + LEASE / 2))
+        # A worker that died holding it loses the lease.
+        self.assertTrue(_claim(entry.id, now + LEASE + timedelta(seconds=1)))
+        entry.refresh_from_db()
+        self.assertEqual(entry.attempts, 2)
+
+    def test_failed_attempt_is_retried(self):
+        server = self.start_stripe(fail=1)
+        entry = self.make_checkout()
+
+        entry = process_checkout(entry.id)
+        self.assertEqual(entry.status, CheckoutStatus.PENDING)
+        self.assertEqual(entry.attempts, 1)
+        self.assertTrue(entry.last_error)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        # Not due yet: no second call.
+        self.assertEqual(
+            process_checkout(entry.id).status,
+            CheckoutStatus.PENDING
+        )
+        self.assertEqual(server.requests, 1)
+
+        entry = process_checkout(
+            entry.id,
+            now=entry.next_attempt_at + timedelta(seconds=1)
+        )
+        self.assertEqual(entry.status, CheckoutStatus.READY)
+        self.assertEqual(entry.last_error, "")
+        self.assertEqual(server.requests, 2)
+        self.assertEqual(len(server.sessions), 1)
+
+    def test_checkout_status(self):
+        self.start_stripe()
+        entry = self.make_checkout()
+        url = f"/en/api/v1/store/orders/{entry.order_id}/checkout/"
+
+        self.assertEqual(
+            self.client.get(url).json()["status"],
+            CheckoutStatus.PENDING
+        )
+        process_checkout(entry.id)
+        data = self.client.get(url).json()
+        self.assertEqual(data["status"], CheckoutStatus.READY)
+        self.assertTrue(data["checkout_url"])
+
+        self.login(make_user("other@example.com"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class FastPathParityTests(StoreTestCase):
+    """The fastpath renderers match the DRF serializers byte for byte."""
+
+    def setUp(self):
+        super().setUp()
+        self.items = make_catalog(3)
+        first, second, third = self.items
+        Item.objects.filter(id=first.id).update(
+            name_uk="Сорочка",
+            fabric_uk="бавовна"
+        )
+        ItemColor.objects.filter(color_en="red").update(color_uk="червоний")
+        ItemDescription.objects.filter(item=first).update(title_uk="Тканина")
+        ImageItem.objects.create(item=first, image="items/0-back.png")
+        ImageItem.objects.filter(item=second).delete()
+        third.inventory.all().delete()
+
+    def assert_same(self, drf, fast) -> None:
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(drf), renderer.render(fast))
+
+    def test_items(self):
+        items = Item.objects.order_by("id")
+        for serializer_class in (ItemSerializer, ItemDetailSerializer):
+            for expand in ((), serializer_class.Meta.expandable_fields):
+                names = serializer_class.get_requested_fields(expand=expand)
+                for language, _ in settings.LANGUAGES:
+                    with self.subTest(
+                            serializer=serializer_class.__name__,
+                            expand=expand,
+                            language=language
+                    ), translation.override(language):
+                        self.assert_same(
+                            serializer_class(
+                                serializer_class.setup_eager_loading(
+                                    items,
+                                    names
+                                ),
+                                many=True,
+                                expand=expand
+                            ).data,
+                            serialize_items(
+                                items.values(*ITEM_COLUMNS),
+                                names
+                            ),
+                        )
+
+        with translation.override("uk"):
+            [first, _, third] = serialize_items(
+                items.values(*ITEM_COLUMNS),
+                ItemSerializer.get_requested_fields()
+            )
+        self.assertEqual(first["name"], "Сорочка")
+        self.assertIn("червоний", [
+            variant["color"] for variant in first["additional_info"]
+        ])
+        self.assertEqual(third["additional_info"], [])
+
+    def test_orders(self):
+        user = make_user()
+        orders = make_orders(user, self.items[:2])
+        DeliveryInfo.objects.create(
+            order=orders[0],
+            full_name="Buyer",
+            number="1",
+            delivery_type="pickup"
+        )
+        queryset = Order.objects.filter(user=user).order_by("-id")
+        for expand in ((), OrderSerializer.Meta.expandable_fields):
+            names = OrderSerializer.get_requested_fields(expand=expand)
+            for language, _ in settings.LANGUAGES:
+                with self.subTest(
+                        expand=expand,
+                        language=language
+                ), translation.override(language):
+                    self.assert_same(
+                        OrderSerializer(
+                            OrderSerializer.setup_eager_loading(
+                                queryset,
+                                names
+                            ),
+                            many=True,
+                            expand=expand
+                        ).data,
+                        serialize_orders(
+                            queryset.values(*ORDER_COLUMNS),
+                            names
+                        ),
+                    )
+
+
+@shared_cache
+class ResponseCacheTests(StoreTestCase):
+    def test_write_in_transaction_does_not_cache_stale_item(self):
+        item = self.make_catalog(1)[0]
+        url = f"/en/api/v1/store/items/{item.id}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.name = "Renamed shirt"
+            item.save()
+            # Not committed yet: the old version still serves the old
+            # document.
+            response = self.client.get(url)
+            self.assertEqual(response["X-Cache"], "HIT")
+            self.assertEqual(response.json()["name"], "Shirt 0")
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["name"], "Renamed shirt")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+    def test_version_bumped_by_another_process(self):
+        item = self.make_catalog(1)[0]
+        url = f"/en/api/v1/store/items/{item.id}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        # A worker's write bumps the version through its own connection.
+        worker_cache = caches.create_connection("default")
+        with mock.patch.object(response_cache, "cache", worker_cache):
+            response_cache.bump_version(Item)
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }})
+    def test_process_local_cache_is_not_used(self):
+        item = self.make_catalog(1)[0]
+        for url in (
+                f"/en/api/v1/store/items/{item.id}/",
+                "/en/api/v1/store/items/",
+        ):
+            for _ in range(2):
+                self.assertNotIn("X-Cache", self.client.get(url))
+
+
+@shared_cache
+class ConditionalGetTests(StoreTestCase):
+    def test_revalidation_after_write_in_transaction(self):
+        item = self.make_catalog(1)[0]
+        url = f"/en/api/v1/store/items/{item.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.name = "Renamed shirt"
+            item.save()
+            # Until the commit the old body is still current, so the old
+            # validator still matches and no new one is handed out.
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Renamed shirt")
+        self.assertNotEqual(response["ETag"], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_version_bumped_by_another_process(self):
+        item = self.make_catalog(1)[0]
+        url = f"/en/api/v1/store/items/{item.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        worker_cache = caches.create_connection("default")
+        with mock.patch.object(response_cache, "cache", worker_cache):
+            response_cache.bump_version(ItemInventory)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }})
+    def test_no_validators_without_shared_cache(self):
+        item = self.make_catalog(1)[0]
+        response = self.client.get(
+            f"/en/api/v1/store/items/{item.id}/",
+            HTTP_IF_NONE_MATCH="*"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+
+class AnonymousBasketTests(StoreTestCase):
+    def test_merge_in_another_language(self):
+        shirt = self.make_catalog(1)[0]
+        Item.objects.filter(id=shirt.id).update(name_uk="Сорочка")
+        ItemColor.objects.filter(color_en="red").update(color_uk="червоний")
+        user = make_user()
+
+        response = self.client.post(
+            "/uk/api/v1/store/anonymous-basket-items/",
+            {"item": "Сорочка", "size": "S", "color": "червоний",
+             "quantity": 2},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        token = response[BASKET_TOKEN_HEADER]
+        # The same variant under its English names is the same line.
+        response = self.client.post(
+            "/en/api/v1/store/anonymous-basket-items/",
+            {"item": "Shirt 0", "size": "S", "color": "red", "quantity": 1},
+            format="json",
+            HTTP_X_BASKET_TOKEN=token,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["quantity"], 3)
+
+        response = self.client.post(
+            "/en/api/v1/users/token/",
+            {"email": user.email, "password": PASSWORD},
+            format="json",
+            HTTP_X_BASKET_TOKEN=token,
+        )
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()["basket"]
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(
+            (result["item"], result["color"], result["quantity"]),
+            ("Shirt 0", "red", 3)
+        )
+        line = BasketItem.objects.get(basket__user=user)
+        self.assertEqual(
+            (line.item_id, line.size.size, line.color.color_en),
+            (shirt.id, "S", "red")
+        )
+
+
+class CatalogChangeTests(StoreTestCase):
+    def add_to_basket(self, item) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/en/api/v1/store/basket-items/",
+                {"item": item.name, "size": "S", "color": "red"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_refresh_sends_only_moved_items(self):
+        first, second = self.make_catalog(2)
+        sent = []
+
+        def receiver(sender, item_ids, **kwargs):
+            sent.append(item_ids)
+
+        stock_changed.connect(receiver)
+        self.addCleanup(stock_changed.disconnect, receiver)
+        self.assertEqual(Item.objects.refresh_stock(), 0)
+        second.inventory.update(reserved=1)
+        self.assertEqual(sent, [[second.id]])
+
+    @shared_cache
+    def test_stock_move_bumps_only_stock_version(self):
+        item = self.make_catalog(1)[0]
+        self.login()
+        versions = response_cache.get_versions(Item, ItemInventory)
+        client = APIClient()
+        categories = client.get("/en/api/v1/store/categories/")["ETag"]
+        detail = client.get(f"/en/api/v1/store/items/{item.id}/")["ETag"]
+
+        self.add_to_basket(item)
+        item_version, stock_version = response_cache.get_versions(
+            Item,
+            ItemInventory
+        )
+        self.assertEqual(item_version, versions[0])
+        self.assertNotEqual(stock_version, versions[1])
+        self.assertEqual(
+            client.get("/en/api/v1/store/categories/")["ETag"],
+            categories
+        )
+        response = client.get(f"/en/api/v1/store/items/{item.id}/")
+        self.assertNotEqual(response["ETag"], detail)
+        self.assertEqual(response.json()["additional_info"][0]["amount"], 2)
+
+    def test_stock_rebuild_is_left_to_celery(self):
+        item = self.make_catalog(1)[0]
+        self.login()
+        with self.settings(ASYNC_DOCUMENT_REBUILDS=True), mock.patch.object(
+                utils.rebuild_item_documents_task,
+                "delay"
+        ) as delay:
+            # 18 for a new basket, less the five of the re-render.
+            with self.assertNumQueries(13 + 2):
+                self.add_to_basket(item)
+        delay.assert_called_once_with(
+            [item.id],
+            ["store_service.iteminventory"]
+        )
+
+    def test_variant_rebuild_is_chunked(self):
+        items = self.make_catalog(5)
+        chunks = []
+        render = documents.render_documents
+
+        def render_chunk(item_ids):
+            chunks.append(list(item_ids))
+            return render(item_ids)
+
+        size = ItemSize.objects.get(size="S")
+        with mock.patch.object(documents, "REBUILD_CHUNK_SIZE", 2), \
+                mock.patch.object(documents, "render_documents", render_chunk):
+            with self.captureOnCommitCallbacks(execute=True):
+                size.save()
+        ids = [item.id for item in items]
+        self.assertEqual(chunks, [ids[:2], ids[2:4], ids[4:]])
+
+    def test_large_variant_rebuild_is_left_to_celery(self):
+        items = self.make_catalog(3)
+        size = ItemSize.objects.get(size="S")
+        for limit, deferred in ((3, False), (2, True)):
+            with self.subTest(limit=limit), self.settings(
+                    ASYNC_DOCUMENT_REBUILDS=True,
+                    DOCUMENT_REBUILD_SYNC_LIMIT=limit
+            ), mock.patch.object(
+                    utils.rebuild_item_documents_task,
+                    "delay"
+            ) as delay:
+                with self.captureOnCommitCallbacks(execute=True):
+                    size.save()
+                if deferred:
+                    delay.assert_called_once_with(
+                        [item.id for item in items],
+                        ["store_service.itemsize"]
+                    )
+                else:
+                    delay.assert_not_called()
+
+
+class ConcurrentStockTests(TransactionTestCase):
+    def test_hold_and_checkout_under_concurrency(self):
+        output = StringIO()
+        # Fails on any oversold unit or unhandled database error.
+        call_command(
+            "stress_stock",
+            threads=4,
+            attempts=20,
+            stock=30,
+            stdout=output
+        )
+        output = output.getvalue()
+        self.assertEqual(output.count("oversold 0 units"), 2, output)
+        self.assertEqual(output.count("errors 0"), 2, output)
+
+    def test_lock_errors_are_retried(self):
+        locked = OperationalError("database is locked")
+        with mock.patch.object(stock, "CONFLICT_BACKOFF", 0):
+            take = mock.Mock(side_effect=[locked, locked, "taken"])
+            self.assertEqual(stock.atomic_with_retry(take), "taken")
+            self.assertEqual(take.call_count, 3)
+
+            take = mock.Mock(side_effect=locked)
+            with self.assertRaises(stock.StockConflict):
+                stock.atomic_with_retry(take)
+            self.assertEqual(take.call_count, stock.CONFLICT_RETRIES + 1)
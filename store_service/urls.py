@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
+    AnonymousBasketItemViewSet,
     BasketItemViewSet,
     BasketModelViewSet,
     CategoryModelViewSet,
@@ -15,6 +16,11 @@ router.register("basket", BasketModelViewSet)
 router.register("categories", CategoryModelViewSet)
 router.register("orders", OrderModelViewSet)
 router.register(r"basket-items", BasketItemViewSet, basename="basketitem")
+router.register(
+    r"anonymous-basket-items",
+    AnonymousBasketItemViewSet,
+    basename="anonymousbasketitem"
+)
 
 urlpatterns = [
     path("", include(router.urls)),
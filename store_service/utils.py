@@ -9,7 +9,11 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
 from config import settings
+from store_service.cache import bump_version
+from store_service.checkout import process_pending_checkouts
+from store_service.documents import rebuild_item_documents
 from store_service.models import Order
+from store_service.stock import release_expired_holds
 from user_service.models import User
 
 
@@ -118,6 +122,23 @@ def translate_and_update_description(item_id: int) -> None:
         logger.error(f"Ошибка при переводе ids и обновлении модели: {e}")
 
 
+@shared_task
+def release_expired_holds_task() -> int:
+    return release_expired_holds()
+
+
+@shared_task
+def process_checkout_outbox_task() -> int:
+    return process_pending_checkouts()
+
+
+@shared_task
+def rebuild_item_documents_task(item_ids: list, models: list) -> int:
+    written = rebuild_item_documents(item_ids)
+    bump_version(*(apps.get_model(label) for label in models))
+    return written
+
+
 def send_email_order_created(order: Order, user: User) -> None:
     message = (
         f"Hello!\n\n"
@@ -1,11 +1,16 @@
 import stripe
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.db.models import prefetch_related_objects
 from django.http import HttpResponse
 from django.shortcuts import redirect
+from django.utils.translation import get_language
 from django.views.decorators.csrf import csrf_exempt
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 
 from user_service.models import User
@@ -14,23 +19,68 @@ from .models import (
     Basket,
     BasketItem,
     Category,
+    CheckoutOutbox,
     DeliveryInfo,
     Item,
     ItemColor,
     ItemInventory,
-    ItemSize,
     Order,
-    OrderItem, PostDepartment,
+    OrderItem, PaymentType, PostDepartment,
 )
+from .baskets import (
+    BASKET_TOKEN_HEADER,
+    NOT_FOUND,
+    apply_basket_lines,
+    basket_summary,
+    get_anonymous_basket,
+    new_basket_token,
+    resolve_variants,
+    save_anonymous_basket,
+    variant_key,
+)
+from .cache import (
+    VERSIONED_MODELS,
+    cache_response,
+    versioned_key,
+    versions_are_shared,
+)
+from .checkout import enqueue_checkout, process_checkout
+from .conditional import conditional_get
+from .documents import render_items
+from .facets import FACET_MODELS, FACETS_CACHE_TIMEOUT, item_facets
+from .fastpath import (
+    ITEM_COLUMNS,
+    ORDER_COLUMNS,
+    iter_chunks,
+    serialize_items,
+    serialize_orders,
+)
+from .filters import FILTER_PARAMS, filter_items, order_items
+from .pagination import KeysetPagination
+from .renderers import stream_json
 from .serializers import (
+    BasketBulkSerializer,
     BasketItemSerializer,
+    BasketLineSerializer,
     BasketSerializer,
+    BasketSummarySerializer,
     CategoryDetailSerializer,
+    CheckoutStatusSerializer,
     CategorySerializer,
+    ItemBatchSerializer,
     ItemDetailSerializer,
     ItemSerializer,
     OrderSerializer,
 )
+from .stock import (
+    InsufficientStock,
+    StockConflict,
+    atomic_with_retry,
+    hold_expiry,
+    hold_stock,
+    release_holds,
+    take_stock_for_lines,
+)
 from .utils import (
     send_email_order_created,
     send_email_to_user_about_order_success)
@@ -39,8 +89,13 @@ from .utils import (
 @extend_schema_view(
     list=extend_schema(
         summary="List items",
-        description="Retrieve a list of items, with optional filters for size,"
-                    " color, brand, sale status, stock status, and ordering.",
+        description="Retrieve a list of items, with optional full-text"
+                    " search (q), filters for size, color, brand, sale"
+                    " status, stock status, effective price range"
+                    " (min_price, max_price), and ordering by newest or"
+                    " effective price (cheaper, exp). Use fields to"
+                    " pick the returned fields and expand=image to add"
+                    " the first image.",
         responses={200: ItemSerializer(many=True)},
     ),
     retrieve=extend_schema(
@@ -52,6 +107,8 @@ from .utils import (
 class ItemModelViewSet(viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     queryset = Item.objects.all()
+    pagination_class = KeysetPagination
+    conditional_models = VERSIONED_MODELS
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -59,33 +116,117 @@ class ItemModelViewSet(viewsets.ModelViewSet):
         return self.serializer_class
 
     def get_queryset(self):
-        queryset = Item.objects.all()
-        size = self.request.query_params.get("size", None)
-        if size:
-            queryset = queryset.filter(size__contains=size)
-        color = self.request.query_params.get("color", None)
-        if color:
-            queryset = queryset.filter(color__contains=color)
-        brand = self.request.query_params.get("brand", None)
-        if brand:
-            queryset = queryset.filter(brand__contains=brand)
-        sale = self.request.query_params.get("sale", None)
-        if sale:
-            sale = sale.lower() == "true"
-            queryset = queryset.filter(sale=sale)
-        in_stock = self.request.query_params.get("in_stock", None)
-        if in_stock:
-            in_stock = in_stock.lower() == "true"
-            queryset = queryset.filter(in_stock=in_stock)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            if ordering.lower() == "newest":
-                queryset = queryset.order_by("-id")
-            elif ordering.lower() == "cheaper":
-                queryset = queryset.order_by("price")
-            elif ordering.lower() == "exp":
-                queryset = queryset.order_by("-price")
-        return queryset
+        params = self.request.query_params
+        return order_items(filter_items(Item.objects.all(), params), params)
+
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if settings.FAST_SERIALIZATION:
+            queryset = queryset.values(
+                *ITEM_COLUMNS,
+                *queryset.query.annotations
+            )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            render_items(page, "summary", self.get_serializer_context())
+        )
+
+    @conditional_get
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        [data] = render_items(
+            [instance],
+            "detail",
+            self.get_serializer_context()
+        )
+        return Response(data)
+
+    @extend_schema(
+        summary="Item facet counts",
+        description="Count items per size, color, brand, category, sale"
+                    " and stock status under the same filters as the"
+                    " item list.",
+    )
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        params = sorted(
+            (name, value)
+            for name, value in request.query_params.items()
+            if name in FILTER_PARAMS and value
+        )
+        key = None
+        if versions_are_shared():
+            key = versioned_key(
+                "facets",
+                FACET_MODELS,
+                get_language(),
+                params
+            )
+        data = cache.get(key) if key else None
+        if data is None:
+            data = item_facets(
+                filter_items(Item.objects.all(), request.query_params)
+            )
+            if key:
+                cache.set(key, data, FACETS_CACHE_TIMEOUT)
+        return Response(data)
+
+    @extend_schema(
+        summary="Retrieve items in bulk",
+        description="Retrieve up to 100 items by id, given as ?ids=1,5,9"
+                    " or as a POST body of ids, in the requested order."
+                    " Unknown ids are skipped.",
+        request=ItemBatchSerializer,
+        responses={200: ItemDetailSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get", "post"])
+    def batch(self, request):
+        if request.method == "GET":
+            return self.batch_get(request)
+        return self.batch_response(request.data)
+
+    @conditional_get
+    @cache_response
+    def batch_get(self, request):
+        ids = request.query_params.get("ids", "")
+        return self.batch_response(
+            {"ids": [value for value in ids.split(",") if value.strip()]}
+        )
+
+    def batch_response(self, data):
+        serializer = ItemBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        items = Item.objects.in_bulk(ids)
+        return Response(render_items(
+            [items[item_id] for item_id in ids if item_id in items],
+            "detail",
+            self.get_serializer_context()
+        ))
+
+    @extend_schema(
+        summary="Export items",
+        description="Stream every item matching the item list filters as"
+                    " one JSON array, honouring fields and expand.",
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAdminUser]
+    )
+    def export(self, request):
+        field_names = ItemSerializer.get_requested_fields(request)
+        rows = self.filter_queryset(self.get_queryset()).values(*ITEM_COLUMNS)
+        return stream_json(
+            (
+                serialize_items(chunk, field_names)
+                for chunk in iter_chunks(rows)
+            ),
+            filename="items.json"
+        )
 
 
 @extend_schema_view(
@@ -115,7 +256,24 @@ class BasketModelViewSet(viewsets.ModelViewSet):
         return BasketSerializer
 
     def get_queryset(self):
-        return Basket.objects.filter(user=self.request.user)
+        return BasketSerializer.setup_eager_loading(
+            Basket.objects.filter(user=self.request.user),
+            BasketSerializer.get_requested_fields(self.request)
+        )
+
+    @extend_schema(
+        summary="Basket summary",
+        description="Line count, total quantity, subtotal and sale"
+                    " savings at current prices, and how many units each"
+                    " line can have (its own hold included). Computed"
+                    " with two aggregate queries, cheap enough to poll.",
+        responses={200: BasketSummarySerializer},
+    )
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        return Response(
+            BasketSummarySerializer(basket_summary(request.user)).data
+        )
 
 
 class BasketItemViewSet(viewsets.ModelViewSet):
@@ -126,75 +284,256 @@ class BasketItemViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return BasketItem.objects.filter(basket__user=user)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
-        item = request.data.get("item")
-        size = request.data.get("size")
-        color = request.data.get("color")
-        quantity = request.data.get("quantity", 1)
-        item_main = Item.objects.get(name=item)
-        print(";get; done")
+        """
+        Add a variant to the user's basket and hold its stock until
+        the line's ``hold_expires_at``.
+
+        Query budget, pinned by BasketQueryBudgetTests: one SELECT
+        resolves the variant with its item, size and color; the basket
+        and line lookups take one each, and an INSERT inside a savepoint
+        (three statements) each when they are created; the line UPDATE
+        takes one when it already exists; the conditional UPDATE that
+        holds the stock brings the item lookup, the lookup of items whose
+        stock moved and their stock refresh with it (four). After commit the
+        item's ItemDocument is re-rendered (five, or none when
+        ASYNC_DOCUMENT_REBUILDS leaves it to Celery). 13 statements in all
+        when the line exists, 15 when it is new and 18 when the basket is
+        created too. Images are read from the item when the basket is
+        rendered, so none are written here.
+        """
         try:
-            item = Item.objects.get(name=item)
-            print("item found")
-            size = ItemSize.objects.get(size=size)
-            print("size found")
-            color = ItemColor.objects.get(color=color)
-            print("color found")
-            inventory = ItemInventory.objects.get(
-                item=item,
-                size=size,
-                color=color
+            quantity = int(request.data.get("quantity", 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            return Response(
+                {"error": "Quantity must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            print("inventory found")
-
-            if inventory.quantity < int(quantity):
-                return Response(
-                    {"error": "Not enough items in stock"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
 
-        except (
-                Item.DoesNotExist,
-                ItemSize.DoesNotExist,
-                ItemColor.DoesNotExist,
-                ItemInventory.DoesNotExist,
-        ):
+        inventory = ItemInventory.objects.select_related(
+            "item",
+            "size",
+            "color"
+        ).filter(
+            item__in=Item.objects.filter(name=request.data.get("item")),
+            size__size=request.data.get("size"),
+            color__in=ItemColor.objects.filter(
+                color=request.data.get("color")
+            ),
+        ).first()
+        if inventory is None:
             return Response(
                 {"error": "Item, size, color, or inventory not found"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         basket, _ = Basket.objects.get_or_create(user=request.user)
-
-        basket_item, created = BasketItem.objects.get_or_create(
+        expires_at = hold_expiry()
+        lines = BasketItem.objects.select_for_update()
+        basket_item, created = lines.get_or_create(
             basket=basket,
-            item=item,
-            size=size,
-            color=color,
-            price=item_main.price,
-            defaults={"price": item_main.price, "quantity": quantity},
+            item=inventory.item,
+            size=inventory.size,
+            color=inventory.color,
+            defaults={
+                "price": inventory.item.effective_price,
+                "quantity": quantity,
+                "hold_expires_at": expires_at,
+            },
         )
-        if not created:
-            basket_item.quantity += int(quantity)
-            basket_item.save()
+        # A line whose hold was released holds its whole quantity again.
+        to_hold = quantity
+        if not created and basket_item.hold_expires_at is None:
+            to_hold += basket_item.quantity
+        try:
+            hold_stock(to_hold, variant=inventory.item, id=inventory.id)
+        except InsufficientStock as e:
+            transaction.set_rollback(True)
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         if not created:
-            if inventory.quantity < basket_item.quantity:
-                return Response(
-                    {"error": "Not enough items in stock 162"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            basket_item.quantity += int(quantity)
-            basket_item.save()
-        inventory.quantity -= int(quantity)
-        for img in item.images.all():
-            basket_item.images.add(img)
-        basket_item.save()
-        inventory.save()
+            basket_item.quantity += quantity
+            basket_item.hold_expires_at = expires_at
+            basket_item.save(update_fields=["quantity", "hold_expires_at"])
+            # Render with the variant already loaded above.
+            basket_item.item = inventory.item
+            basket_item.size = inventory.size
+            basket_item.color = inventory.color
 
         serializer = self.get_serializer(basket_item)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        summary="Add basket lines in bulk",
+        description="Add up to 100 lines of item, size, color and"
+                    " quantity to the basket in one transaction, or with"
+                    " replace=true make them the whole basket. Every line"
+                    " gets a result in request order: status ok with the"
+                    " resulting line, or status error with the reason."
+                    " Failed lines leave their variant as it was. Answers"
+                    " 207 when some lines failed.",
+        request=BasketBulkSerializer,
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = BasketBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            basket, _ = Basket.objects.get_or_create(user=request.user)
+            results = apply_basket_lines(
+                basket,
+                serializer.validated_data["lines"],
+                replace=serializer.validated_data["replace"],
+            )
+        failed = any(result["status"] != "ok" for result in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_207_MULTI_STATUS if failed
+            else status.HTTP_200_OK,
+        )
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        line = serializer.instance
+        release_holds(BasketItem.objects.filter(id=line.id))
+        data = serializer.validated_data
+        item = data.get("item", line.item)
+        try:
+            hold_stock(
+                data.get("quantity", line.quantity),
+                variant=item,
+                item=item,
+                size=data.get("size", line.size),
+                color=data.get("color", line.color),
+            )
+        except InsufficientStock as e:
+            raise ValidationError({"error": str(e)})
+        serializer.save(hold_expires_at=hold_expiry())
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="List anonymous basket lines",
+        description="Lines of the basket named by the X-Basket-Token"
+                    " header; empty without one.",
+    ),
+    create=extend_schema(
+        summary="Add to an anonymous basket",
+        description="Add a line without logging in. The first add issues"
+                    " a basket token in the X-Basket-Token response"
+                    " header; send it back on later calls and on login"
+                    " (token/) to move the lines into the user's basket."
+                    " Stock is checked but not held.",
+        request=BasketLineSerializer,
+    ),
+    partial_update=extend_schema(
+        summary="Change an anonymous basket line",
+        request=BasketLineSerializer,
+    ),
+    destroy=extend_schema(summary="Remove an anonymous basket line"),
+)
+class AnonymousBasketItemViewSet(viewsets.ViewSet):
+    """
+    BasketItemViewSet for shoppers who are not logged in, backed by the
+    cache instead of the database (see ``baskets``).
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get_basket(self, request, create: bool = False) -> tuple:
+        token = request.headers.get(BASKET_TOKEN_HEADER)
+        if token is None and create:
+            token = new_basket_token()
+        if token is None:
+            return None, {"next_id": 1, "lines": []}
+        basket = get_anonymous_basket(token)
+        if basket is None:
+            raise ValidationError(
+                {"error": "Invalid or expired basket token"}
+            )
+        return token, basket
+
+    @staticmethod
+    def get_line(basket, pk) -> dict:
+        for line in basket["lines"]:
+            if str(line["id"]) == str(pk):
+                return line
+        raise NotFound()
+
+    @staticmethod
+    def get_variant(line):
+        inventory = resolve_variants([line], lock=False).get(
+            variant_key(line)
+        )
+        if inventory is None:
+            raise ValidationError({"error": NOT_FOUND})
+        return inventory
+
+    @staticmethod
+    def check_stock(inventory, quantity: int) -> None:
+        if inventory.available < quantity:
+            raise ValidationError({
+                "error": str(InsufficientStock(quantity, inventory.item))
+            })
+
+    @staticmethod
+    def respond(token, data, status_code=status.HTTP_200_OK) -> Response:
+        response = Response(data, status=status_code)
+        if token is not None:
+            response[BASKET_TOKEN_HEADER] = token
+        return response
+
+    def list(self, request):
+        token, basket = self.get_basket(request)
+        return self.respond(token, basket["lines"])
+
+    def create(self, request):
+        serializer = BasketLineSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token, basket = self.get_basket(request, create=True)
+        data = dict(serializer.validated_data)
+        inventory = self.get_variant(data)
+        # Lines are matched by inventory id: the same variant added under
+        # another language has other names.
+        for line in basket["lines"]:
+            if line.get("inventory") == inventory.id:
+                data["quantity"] += line["quantity"]
+                break
+        else:
+            line = {"id": basket["next_id"]}
+            basket["next_id"] += 1
+            basket["lines"].append(line)
+        self.check_stock(inventory, data["quantity"])
+        line.update(data, inventory=inventory.id)
+        save_anonymous_basket(token, basket)
+        return self.respond(token, line, status.HTTP_201_CREATED)
+
+    def partial_update(self, request, pk=None):
+        token, basket = self.get_basket(request)
+        line = self.get_line(basket, pk)
+        serializer = BasketLineSerializer(data={**line, **request.data})
+        serializer.is_valid(raise_exception=True)
+        data = {**line, **serializer.validated_data}
+        if {"item", "size", "color"} & set(request.data):
+            data["inventory"] = None
+        inventory = self.get_variant(data)
+        self.check_stock(inventory, data["quantity"])
+        line.update(data, inventory=inventory.id)
+        save_anonymous_basket(token, basket)
+        return self.respond(token, line)
+
+    def destroy(self, request, pk=None):
+        token, basket = self.get_basket(request)
+        basket["lines"].remove(self.get_line(basket, pk))
+        save_anonymous_basket(token, basket)
+        return self.respond(token, None, status.HTTP_204_NO_CONTENT)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -202,10 +541,26 @@ class BasketItemViewSet(viewsets.ModelViewSet):
         description="Retrieve a list of categories.",
         responses={200: CategorySerializer(many=True)},
     ),
+    retrieve=extend_schema(
+        summary="Retrieve a category",
+        description="Retrieve a category with one page of its items,"
+                    " accepting the same filters, ordering and cursor"
+                    " parameters as the item list.",
+        responses={200: CategoryDetailSerializer},
+    ),
 )
 class CategoryModelViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    pagination_class = KeysetPagination
+
+    @property
+    def conditional_models(self):
+        # The list carries no items, so item and stock writes leave its
+        # cached pages and validators alone.
+        if self.action == "list":
+            return (Category,)
+        return VERSIONED_MODELS
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -213,13 +568,41 @@ class CategoryModelViewSet(viewsets.ModelViewSet):
         else:
             return self.serializer_class
 
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        category = self.get_object()
+        params = request.query_params
+        items = order_items(
+            filter_items(Item.objects.filter(category=category), params),
+            params
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(items, request, view=self)
+        context = self.get_serializer_context()
+        context["items"] = {
+            "count": items.count(),
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": render_items(page, "detail", context),
+        }
+        return Response(self.get_serializer(category, context=context).data)
+
 
 @extend_schema_view(
     create=extend_schema(
         request=OrderSerializer,
         summary="Create an order",
         description="Create a new order for the user,"
-                    " including delivery address and items from the basket.",
+                    " including delivery address and items from the basket."
+                    " Orders paid through Stripe also carry checkout_status;"
+                    " while it is pending, checkout_url is null and can be"
+                    " polled from orders/{id}/checkout/.",
         responses={201: OrderSerializer},
     ),
 )
@@ -227,23 +610,79 @@ class OrderModelViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     queryset = Order.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Order.objects.filter(user=user)
+        return OrderSerializer.setup_eager_loading(
+            Order.objects.filter(user=user).order_by("-id"),
+            OrderSerializer.get_requested_fields(self.request)
+        )
 
-    @transaction.atomic
-    def create(self, request, *args, **kwargs):
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            Order.objects.filter(user=request.user)
+            .order_by("-id")
+            .values(*ORDER_COLUMNS)
+        )
+        return self.get_paginated_response(serialize_orders(
+            page,
+            OrderSerializer.get_requested_fields(request)
+        ))
+
+    @extend_schema(
+        summary="Export orders",
+        description="Stream all orders of the current user as one JSON"
+                    " array, honouring fields and expand.",
+    )
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        field_names = OrderSerializer.get_requested_fields(request)
+        rows = Order.objects.filter(user=request.user).order_by("-id")
+        return stream_json(
+            (
+                serialize_orders(chunk, field_names)
+                for chunk in iter_chunks(rows.values(*ORDER_COLUMNS))
+            ),
+            filename="orders.json"
+        )
 
+    def create(self, request, *args, **kwargs):
+        try:
+            response, checkout = atomic_with_retry(self.place_order, request)
+        except StockConflict as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        # The order has committed, so Stripe is called without holding
+        # its transaction or the inventory locks.
+        if checkout is not None and not settings.CHECKOUT_WORKER_ONLY:
+            checkout = process_checkout(checkout.id)
+            response.data["checkout_url"] = checkout.order.checkout_url
+            response.data["checkout_status"] = checkout.status
+        return response
+
+    def place_order(self, request) -> tuple:
+        """
+        Create the order from the user's basket. Returns the response and
+        the order's CheckoutOutbox entry when it pays through Stripe.
+        Runs inside ``atomic_with_retry``, so lock errors are left to
+        propagate and retry the whole order.
+        """
         user = self.request.user
 
         try:
             basket = self.get_basket_for_user(user)
+        except OperationalError:
+            raise
         except Exception:
             return Response({
                 "error": "Unable to retrieve basket"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
         data = request.data.get("delivery_info")
         delivery_info = {
@@ -266,7 +705,7 @@ class OrderModelViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Delivery information is incomplete"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
         if (not post_department["city"]
                 or not post_department["state"]
@@ -274,7 +713,7 @@ class OrderModelViewSet(viewsets.ModelViewSet):
             return Response({
                 "error": "Post department data is required"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
         try:
             p_data = self.create_post_department(post_department)
@@ -291,46 +730,71 @@ class OrderModelViewSet(viewsets.ModelViewSet):
 
             payment_type = request.data.get("payment_type")
 
-            if payment_type == "card":
-                checkout_url = self.prepare_checkout_session(order.id)
-                order.checkout_url = checkout_url
-                order.save()
-
-                serializer = self.get_serializer(order)
-                response_data = serializer.data
-                response_data["checkout_url"] = checkout_url
-                return Response(response_data, status=status.HTTP_201_CREATED)
-
-            elif payment_type == "cash_on_delivery":
-                checkout_url = self.prepare_checkout_session(order.id)
-                order.checkout_url = checkout_url
-                order.save()
-
-                serializer = self.get_serializer(order)
-                response_data = serializer.data
-                response_data["checkout_url"] = checkout_url
-                return Response(response_data, status=status.HTTP_201_CREATED)
+            if payment_type in (
+                    PaymentType.CARD,
+                    PaymentType.CASH_ON_DELIVERY
+            ):
+                checkout = enqueue_checkout(order)
+                response_data = self.get_order_serializer(order).data
+                response_data["checkout_url"] = None
+                response_data["checkout_status"] = checkout.status
+                return (
+                    Response(response_data, status=status.HTTP_201_CREATED),
+                    checkout
+                )
 
             else:
                 order.is_paid = False
                 order.save()
                 self.delete_basket(user)
 
-                serializer = self.get_serializer(order)
+                serializer = self.get_order_serializer(order)
                 return Response(
                     serializer.data,
                     status=status.HTTP_201_CREATED
-                )
+                ), None
 
-        except ValueError as e:
+        except OperationalError:
+            raise
+        except (InsufficientStock, ValueError) as e:
+            # Undo the stock already taken for this order.
+            transaction.set_rollback(True)
             return Response(
                 {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
         except Exception as e:
+            transaction.set_rollback(True)
             return Response(
                 {"error": f"An unexpected error occurred: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
-            )
+            ), None
+
+    @extend_schema(
+        summary="Checkout status",
+        description="Status of the order's Stripe checkout session:"
+                    " pending until a worker has created it, then ready"
+                    " with its checkout_url, or failed after repeated"
+                    " Stripe errors. One indexed query, safe to poll.",
+        responses={200: CheckoutStatusSerializer},
+    )
+    @action(detail=True, methods=["get"])
+    def checkout(self, request, pk=None):
+        checkout = CheckoutOutbox.objects.select_related("order").filter(
+            order__user=request.user,
+            order_id=pk if str(pk).isdigit() else None,
+        ).first()
+        if checkout is None:
+            raise NotFound("This order has no checkout session.")
+        return Response(CheckoutStatusSerializer(checkout).data)
+
+    def get_order_serializer(self, order: Order):
+        """The serializer for a new order, with its lines loaded at once."""
+        serializer = self.get_serializer(order)
+        prefetch_related_objects(
+            [order],
+            *OrderSerializer.get_prefetch_lookups(list(serializer.fields))
+        )
+        return serializer
 
     def create_post_department(self, post_department: dict) -> PostDepartment:
         try:
@@ -341,6 +805,8 @@ class OrderModelViewSet(viewsets.ModelViewSet):
             )
         except KeyError as e:
             raise ValueError(f"Missing key in post_department: {e}")
+        except OperationalError:
+            raise
         except Exception as e:
             raise ValueError(f"Error creating PostDepartment: {str(e)}")
 
@@ -356,6 +822,8 @@ class OrderModelViewSet(viewsets.ModelViewSet):
                 payment_type=payment_type,
                 post_department=p_data
             )
+        except OperationalError:
+            raise
         except Exception as e:
             raise ValueError(f"Error creating order: {str(e)}")
 
@@ -377,105 +845,50 @@ class OrderModelViewSet(viewsets.ModelViewSet):
             raise ValueError(f"Order with id {order_id} does not exist.")
         except KeyError as e:
             raise ValueError(f"Missing key in delivery_info: {e}")
+        except OperationalError:
+            raise
         except Exception as e:
             raise ValueError(f"Error creating delivery info: {str(e)}")
 
     def create_order_items(self, basket: Basket, order: Order):
+        """
+        Turn the basket lines into order lines and take their stock with
+        a fixed number of queries: one locked read of the lines with
+        their items, the set-based stock take of
+        ``take_stock_for_lines`` and one INSERT for the order lines.
+        """
         try:
-            for basket_item in basket.basket_items.all():
-                item = Item.objects.get(id=basket_item.item.id)
-                inventory = ItemInventory.objects.get(
-                    item=basket_item.item,
-                    size=basket_item.size,
-                    color=basket_item.color
-                )
-                if inventory.quantity < basket_item.quantity:
-                    raise ValueError(
-                        f"Not enough items in stock for {item.name}"
-                    )
-
-                inventory.quantity -= basket_item.quantity
-                inventory.save()
-
-                OrderItem.objects.create(
+            basket_items = list(
+                basket.basket_items.select_for_update(
+                    of=("self",)
+                ).select_related("item")
+            )
+            take_stock_for_lines(basket_items)
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     item=basket_item.item,
-                    price=item.price,
-                    size=basket_item.size,
-                    color=basket_item.color,
+                    price=basket_item.item.effective_price,
+                    size_id=basket_item.size_id,
+                    color_id=basket_item.color_id,
                     quantity=basket_item.quantity,
                 )
+                for basket_item in basket_items
+            ])
+        except InsufficientStock:
+            raise
+        except OperationalError:
+            raise
         except Exception as e:
             raise ValueError(f"Error creating order items: {str(e)}")
 
-    @transaction.atomic
-    def prepare_checkout_session(self, order_id):
-
-        try:
-            order = Order.objects.get(id=order_id)
-        except Order.DoesNotExist:
-            raise ValueError(f"Order with id {order_id} does not exist.")
-        except Exception as e:
-            raise ValueError(
-                f"Unexpected error while retrieving order: {str(e)}"
-            )
-
-        line_items = []
-        try:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-        except Exception as e:
-            raise ValueError(f"Error setting up Stripe API key: {str(e)}")
-
-        if order.payment_type == "card":
-            try:
-                items = order.items.all()
-                for item in items:
-                    line_items.append({
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {"name": item.item.name},
-                            "unit_amount": int(item.price * 100),
-                        },
-                        "quantity": item.quantity,
-                    })
-            except Exception as e:
-                raise ValueError(f"Error while preparing line items: {str(e)}")
-        else:
-            line_items.append({
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {
-                        "name": "Delivery fee",
-                        "description": "Delivery fee"
-                    },
-                    "unit_amount": 200,
-                },
-                "quantity": 1,
-
-            })
-        return self.create_checkout_session(line_items, order_id)
-
-    def create_checkout_session(self, line_items: list, order_id):
-        try:
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=line_items,
-                mode="payment",
-                success_url="https://inst-store-api.onrender.com/success.html",
-                cancel_url="https://inst-store-api.onrender.com/cancel.html",
-                metadata={
-                    "order_id": order_id,
-                },
-            )
-            return checkout_session.url
-        except Exception as e:
-            raise ValueError(f"Failed to create checkout session: {str(e)}")
-
     def get_basket_for_user(self, user: User) -> Basket:
         try:
             return Basket.objects.get(user=user)
         except Basket.DoesNotExist:
             raise ValueError(f"No basket found for user {user}")
+        except OperationalError:
+            raise
         except Exception as e:
             raise ValueError(f"Error retrieving basket: {str(e)}")
 
@@ -486,6 +899,8 @@ class OrderModelViewSet(viewsets.ModelViewSet):
             basket.delete()
         except Basket.DoesNotExist:
             print(f"No basket found for user {user}")
+        except OperationalError:
+            raise
         except Exception as e:
             print(f"Unexpected error during basket deletion: {e}")
 
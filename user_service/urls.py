@@ -1,9 +1,8 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView)
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from user_service.views import (
+    BasketTokenObtainPairView,
     ManageUserView,
     UserRegistrationView,
     VerifyEmailView,
@@ -14,7 +13,11 @@ from user_service.views import (
 urlpatterns = [
     path("register/", UserRegistrationView.as_view(), name="registration"),
     path("me/", ManageUserView.as_view(), name="manage-user"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path(
+        "token/",
+        BasketTokenObtainPairView.as_view(),
+        name="token_obtain_pair"
+    ),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("verifying/", VerifyEmailView.as_view(), name="verifying_email"),
     path("reset_password/",
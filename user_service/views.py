@@ -8,7 +8,11 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from store_service.baskets import BASKET_TOKEN_HEADER, merge_anonymous_basket
+from store_service.pagination import KeysetPagination
 from user_service.models import PasswordReset
 from user_service.serializers import (
     ManageUserSerializer,
@@ -22,6 +26,7 @@ from user_service.utils import send_recovery_email
 class UserModelView(viewsets.ModelViewSet):
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -32,6 +37,30 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
+class BasketTokenObtainPairView(TokenObtainPairView):
+    """
+    Obtain a JWT pair. A basket token sent in the X-Basket-Token header
+    has its anonymous basket merged into the user's basket, and the
+    per-line results are returned as ``basket``.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        data = dict(serializer.validated_data)
+        results = merge_anonymous_basket(
+            serializer.user,
+            request.headers.get(BASKET_TOKEN_HEADER)
+        )
+        if results is not None:
+            data["basket"] = results
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = (permissions.AllowAny,)